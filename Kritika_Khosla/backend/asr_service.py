@@ -0,0 +1,346 @@
+# backend/asr_service.py
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import torch
+import whisper
+
+from .transcribe_all import get_whisper_model
+
+# Whisper decodes 30 s windows; shorter chunks can share one batch
+WINDOW_SECONDS = 30
+
+# Seconds per timestamp token
+TIME_PRECISION = 0.02
+
+# Whisper's transcribe() defaults for when a decode is retried hotter
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class _Request:
+    def __init__(self, session_id, audio_path, decode_options):
+        self.session_id = session_id
+        self.audio_path = audio_path
+        self.decode_options = decode_options or {}
+        self.future = Future()
+
+
+class AsrBatchingService:
+    """
+    In-process ASR service that owns one loaded Whisper model.
+
+    Chunks submitted by all active sessions go into one queue. A worker
+    thread collects them into micro-batches (up to max_batch_size, or
+    whatever arrived within max_wait_ms of the first item) and decodes
+    each batch with a single forward pass per step. Results are handed
+    back through futures, so every session gets its own chunks in order.
+
+    Batched decodes keep segment timestamps and follow the request's
+    temperature fallback schedule: items that fail Whisper's quality
+    checks are decoded again, as a smaller batch, at the next
+    temperature. Chunks longer than one Whisper window, and requests
+    that need word timestamps or carry a prompt, are decoded one at a
+    time with model.transcribe(). A failing chunk only fails its own
+    future.
+    """
+
+    def __init__(self, model_name="base", max_batch_size=8, max_wait_ms=50):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.stats = {"batches": 0, "batched_chunks": 0, "single_chunks": 0}
+
+        self.model, self.lock = get_whisper_model(model_name)
+
+        self.worker = threading.Thread(target=self._run, name="asr-service", daemon=True)
+        self.worker.start()
+
+    def submit(self, session_id, audio_path, decode_options=None):
+        """
+        Queues one chunk. Returns a Future with the Whisper-style result.
+        """
+
+        request = _Request(session_id, audio_path, decode_options)
+        self.queue.put(request)
+
+        return request.future
+
+    def transcribe_many(self, session_id, audio_paths, decode_options=None):
+        """
+        Queues all chunks of a session and waits for them in order.
+        """
+
+        futures = [self.submit(session_id, path, decode_options) for path in audio_paths]
+
+        return [future.result() for future in futures]
+
+    def _collect_batch(self):
+        """
+        Blocks for the first request, then gathers more until the
+        batch is full or the max-wait deadline passes.
+        """
+
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                break
+
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            try:
+                self._decode(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _decode(self, batch):
+        batchable = {}
+
+        for request in batch:
+            try:
+                audio = whisper.load_audio(request.audio_path)
+            except Exception as e:
+                request.future.set_exception(e)
+                continue
+
+            options = request.decode_options
+
+            if (
+                len(audio) <= WINDOW_SECONDS * whisper.audio.SAMPLE_RATE
+                and not options.get("word_timestamps")
+                and not options.get("initial_prompt")
+            ):
+                # Requests sharing language, task and fallback schedule can share a batch
+                key = (
+                    options.get("language"),
+                    options.get("task", "transcribe"),
+                    _temperatures(options)
+                )
+                batchable.setdefault(key, []).append((request, audio))
+            else:
+                self._decode_single(request)
+
+        for (language, task, temperatures), items in batchable.items():
+            try:
+                self._decode_batched(items, language, task, temperatures)
+            except Exception as e:
+                print("ASR batch error, decoding items one at a time:", e)
+
+                for request, _ in items:
+                    if not request.future.done():
+                        self._decode_single(request)
+
+    def _decode_single(self, request):
+        try:
+            with self.lock:
+                result = self.model.transcribe(request.audio_path, **request.decode_options)
+        except Exception as e:
+            request.future.set_exception(e)
+            return
+
+        self.stats["single_chunks"] += 1
+        request.future.set_result(result)
+
+    def _decode_batched(self, items, language, task, temperatures):
+        if getattr(self.model, "is_stub", False):
+            return self._decode_stub_batch(items)
+
+        n_mels = getattr(self.model.dims, "n_mels", 80)
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels)
+            for _, audio in items
+        ]).to(self.model.device)
+
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            self.model.is_multilingual,
+            num_languages=self.model.num_languages,
+            language=language,
+            task=task
+        )
+
+        # Index of each item still to decode, and its latest result
+        pending = list(range(len(items)))
+        final = [None] * len(items)
+
+        for temperature in temperatures:
+            options = whisper.DecodingOptions(
+                language=language,
+                task=task,
+                temperature=temperature,
+                best_of=items[0][0].decode_options.get("best_of", 5) if temperature > 0 else None,
+                without_timestamps=False,
+                fp16=self.model.device.type == "cuda"
+            )
+
+            with self.lock:
+                decoded = whisper.decode(self.model, mels[pending], options)
+
+            self.stats["batches"] += 1
+
+            retry = []
+
+            for k, result in zip(pending, decoded):
+                final[k] = (result, temperature)
+
+                if _needs_fallback(result, items[k][0].decode_options):
+                    retry.append(k)
+
+            pending = retry
+
+            if not pending:
+                break
+
+        self.stats["batched_chunks"] += len(items)
+
+        for (request, audio), (result, temperature) in zip(items, final):
+            duration = len(audio) / whisper.audio.SAMPLE_RATE
+
+            # Skipped as silence, as transcribe() does, whatever text was decoded
+            if _is_silence(result, request.decode_options):
+                segments = []
+            else:
+                segments = _timestamped_segments(tokenizer, result, duration, temperature)
+
+            request.future.set_result({
+                "text": "".join(segment["text"] for segment in segments),
+                "language": result.language,
+                "segments": segments
+            })
+
+    def _decode_stub_batch(self, items):
+        with self.lock:
+            decoded = self.model.transcribe_batch(
+                [audio for _, audio in items],
+                whisper.audio.SAMPLE_RATE
+            )
+
+        self.stats["batches"] += 1
+        self.stats["batched_chunks"] += len(items)
+
+        for (request, _), result in zip(items, decoded):
+            request.future.set_result(result)
+
+
+def _temperatures(options):
+    temperature = options.get("temperature", 0.0)
+
+    if isinstance(temperature, (int, float)):
+        return (float(temperature),)
+
+    return tuple(temperature)
+
+
+def _needs_fallback(result, options):
+    """
+    Whisper's transcribe() check: a decode is retried at the next
+    temperature when it looks repetitive or unlikely, unless the
+    window is silence.
+    """
+
+    logprob_threshold = options.get("logprob_threshold", LOGPROB_THRESHOLD)
+
+    if (
+        result.no_speech_prob > options.get("no_speech_threshold", NO_SPEECH_THRESHOLD)
+        and result.avg_logprob < logprob_threshold
+    ):
+        return False
+
+    return (
+        result.compression_ratio > options.get("compression_ratio_threshold", COMPRESSION_RATIO_THRESHOLD)
+        or result.avg_logprob < logprob_threshold
+    )
+
+
+def _is_silence(result, options):
+    """
+    Whisper's transcribe() skips a window as silence when no_speech_prob
+    is above its threshold and avg_logprob is not above logprob_threshold.
+    """
+
+    return (
+        result.no_speech_prob > options.get("no_speech_threshold", NO_SPEECH_THRESHOLD)
+        and not result.avg_logprob > options.get("logprob_threshold", LOGPROB_THRESHOLD)
+    )
+
+
+def _timestamped_segments(tokenizer, result, duration, temperature):
+    """
+    Splits a decode at its timestamp tokens into Whisper-style
+    segments: <|t0|> text <|t1|><|t1|> text <|t2|> ...
+    """
+
+    timestamp_begin = tokenizer.timestamp_begin
+    segments = []
+    start = None
+    text_tokens = []
+
+    def close(end):
+        text = tokenizer.decode(text_tokens)
+
+        if text.strip():
+            segments.append({
+                "start": float(start),
+                "end": float(min(max(end, start), duration)),
+                "text": text,
+                "tokens": list(text_tokens),
+                "avg_logprob": float(result.avg_logprob),
+                "compression_ratio": float(result.compression_ratio),
+                "no_speech_prob": float(result.no_speech_prob),
+                "temperature": float(temperature)
+            })
+
+    for token in result.tokens:
+        if token >= timestamp_begin:
+            seconds = (token - timestamp_begin) * TIME_PRECISION
+
+            if start is not None and text_tokens:
+                close(seconds)
+                start, text_tokens = None, []
+            else:
+                start = seconds
+        else:
+            if start is None:
+                start = segments[-1]["end"] if segments else 0.0
+            text_tokens.append(token)
+
+    # Text after the last timestamp runs to the end of the chunk
+    if text_tokens:
+        close(duration)
+
+    return segments
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_asr_service(model_name="base"):
+    """
+    Returns the shared service for a model size, starting it on first use.
+    """
+
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = AsrBatchingService(model_name)
+
+    return _services[model_name]
@@ -0,0 +1,124 @@
+# backend/asr_stub.py
+
+import os
+import time
+import wave
+import random
+
+# Seconds of simulated decoding per second of audio
+STUB_REAL_TIME_FACTOR = float(os.getenv("ASR_STUB_RTF", "0.05"))
+
+WORDS_PER_SECOND = 2.5
+WORDS_PER_SENTENCE = 12
+SEGMENT_SECONDS = 5.0
+
+VOCABULARY = (
+    "today we talk about markets startups climate research music health "
+    "education technology policy energy data science products customers "
+    "growth teams stories travel food sports history future ideas people"
+).split()
+
+
+class _Dims:
+    n_mels = 80
+
+
+def _wav_duration(path):
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError):
+        return 0.0
+
+
+def _stub_words(duration, seed):
+    """
+    Deterministic filler text: WORDS_PER_SECOND words with
+    sentence punctuation, so splitting and segmentation have
+    something to work on.
+    """
+
+    rng = random.Random(seed)
+    count = int(duration * WORDS_PER_SECOND)
+    step = duration / count if count else 0.0
+    words = []
+
+    for k in range(count):
+        word = rng.choice(VOCABULARY)
+
+        if k % WORDS_PER_SENTENCE == 0:
+            word = word.capitalize()
+        if k % WORDS_PER_SENTENCE == WORDS_PER_SENTENCE - 1 or k == count - 1:
+            word += "."
+
+        words.append({"word": " " + word, "start": k * step, "end": (k + 1) * step})
+
+    return words
+
+
+def _stub_result(duration, seed, word_timestamps=False):
+    words = _stub_words(duration, seed)
+    segments = []
+
+    for word in words:
+        index = int(word["start"] // SEGMENT_SECONDS)
+
+        if len(segments) <= index:
+            segments.append({"start": word["start"], "end": word["end"], "text": "", "words": []})
+
+        segment = segments[-1]
+        segment["text"] += word["word"]
+        segment["end"] = word["end"]
+        segment["words"].append(word)
+
+    if not word_timestamps:
+        for segment in segments:
+            del segment["words"]
+
+    return {
+        "text": "".join(word["word"] for word in words),
+        "segments": segments,
+        "language": "en"
+    }
+
+
+class StubWhisperModel:
+    """
+    Stand-in for a Whisper model, enabled with ASR_STUB=1.
+
+    Returns deterministic filler transcripts shaped like Whisper's
+    output and sleeps ASR_STUB_RTF seconds per second of audio, so
+    the API, queueing and analysis layers can be load-tested without
+    paying for real decoding.
+    """
+
+    is_stub = True
+    dims = _Dims()
+    device = "cpu"
+
+    def __init__(self, model_name="base"):
+        self.model_name = model_name
+
+    def detect_language(self, mel):
+        return None, {"en": 1.0}
+
+    def transcribe(self, audio_path, **options):
+        duration = _wav_duration(audio_path)
+        time.sleep(duration * STUB_REAL_TIME_FACTOR)
+
+        return _stub_result(
+            duration,
+            seed=os.path.basename(audio_path),
+            word_timestamps=options.get("word_timestamps", False)
+        )
+
+    def transcribe_batch(self, audios, sample_rate=16000):
+        """
+        Batched variant used by the ASR service: one sleep for the
+        longest item, as a single forward pass would take.
+        """
+
+        durations = [len(audio) / sample_rate for audio in audios]
+        time.sleep(max(durations, default=0.0) * STUB_REAL_TIME_FACTOR)
+
+        return [_stub_result(duration, seed=k) for k, duration in enumerate(durations)]
@@ -1,27 +1,100 @@
 # backend/audio_chunk.py
 
 import os
+import json
+import wave
 from pydub import AudioSegment
 
+CHUNK_MANIFEST = "chunks.json"
 
-def trim_and_chunk_audio(audio_path, base_folder, chunk_length_ms=120000):
+
+def trim_and_chunk_audio(audio_path, base_folder, chunk_length_ms=120000, overlap_ms=0):
     """
     Trims and chunks audio into fixed-length pieces.
-    Saves chunks inside session folder.
+    With overlap_ms > 0, consecutive chunks share overlap_ms of audio
+    so words cut at one chunk's edge are complete in the next
+    (see transcript_stitch).
+    Saves chunks inside session folder, plus a chunks.json manifest
+    with each chunk's position in the original audio.
     """
 
+    if not 0 <= overlap_ms < chunk_length_ms:
+        raise ValueError("overlap_ms must be between 0 and chunk_length_ms")
+
     chunks_folder = os.path.join(base_folder, "chunks")
     os.makedirs(chunks_folder, exist_ok=True)
 
     audio = AudioSegment.from_file(audio_path)
 
-    for i, start in enumerate(range(0, len(audio), chunk_length_ms)):
+    manifest = []
+    step_ms = chunk_length_ms - overlap_ms
+
+    for i, start in enumerate(range(0, len(audio), step_ms)):
         end = min(start + chunk_length_ms, len(audio))
         chunk = audio[start:end]
 
-        chunk_file = os.path.join(chunks_folder, f"chunk_{i:03}.wav")
+        chunk_name = f"chunk_{i:03}.wav"
+        chunk_file = os.path.join(chunks_folder, chunk_name)
         chunk.export(chunk_file, format="wav")
 
+        manifest.append({"file": chunk_name, "start_ms": start, "end_ms": end})
+
+        # The rest of the audio is already inside this chunk
+        if end == len(audio):
+            break
+
+    with open(os.path.join(chunks_folder, CHUNK_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+
     print("Audio trimmed and chunked successfully")
 
-    return chunks_folder
\ No newline at end of file
+    return chunks_folder
+
+
+def load_chunk_manifest(chunks_folder):
+    """
+    Returns chunk positions as a list of {"file", "start_ms", "end_ms"}.
+    Folders chunked before the manifest existed are rebuilt from
+    the WAV headers, assuming back-to-back chunks.
+    """
+
+    manifest_file = os.path.join(chunks_folder, CHUNK_MANIFEST)
+
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    manifest = []
+    position = 0
+
+    for file in sorted(f for f in os.listdir(chunks_folder) if f.endswith(".wav")):
+        with wave.open(os.path.join(chunks_folder, file), "rb") as w:
+            duration_ms = int(round(w.getnframes() * 1000 / w.getframerate()))
+
+        manifest.append({"file": file, "start_ms": position, "end_ms": position + duration_ms})
+        position += duration_ms
+
+    return manifest
+
+
+def export_wav_span(wav_path, output_path, start_s, end_s):
+    """
+    Copies the [start_s, end_s) part of a WAV file into a new WAV.
+    Returns output_path.
+    """
+
+    with wave.open(wav_path, "rb") as source:
+        params = source.getparams()
+        rate = source.getframerate()
+
+        start = int(start_s * rate)
+        end = min(int(end_s * rate), source.getnframes())
+
+        source.setpos(min(start, source.getnframes()))
+        frames = source.readframes(max(end - start, 0))
+
+    with wave.open(output_path, "wb") as output:
+        output.setparams(params)
+        output.writeframes(frames)
+
+    return output_path
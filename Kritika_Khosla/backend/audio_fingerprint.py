@@ -0,0 +1,635 @@
+# backend/audio_fingerprint.py
+
+import os
+import json
+import time
+import wave
+import shutil
+import hashlib
+import threading
+import numpy as np
+
+from .sessions import BASE_UPLOAD_DIR, get_session_folder
+
+FINGERPRINT_DIR = os.path.join("dataset", "fingerprints")
+
+SAMPLE_RATE = 16000
+N_FFT = 1024
+HOP = 512
+PEAKS_PER_FRAME = 5
+
+# Each peak is paired with the next FAN_OUT peaks up to MAX_DT frames ahead
+FAN_OUT = 5
+MAX_DT = 63
+
+# A cached chunk is reused for the region of a new chunk where at
+# least MIN_REGION_HASHES hashes line up at one time offset, making up
+# REGION_DENSITY of the new chunk's hashes in that region, over at
+# least MIN_REGION_SECONDS. Matching hashes further apart than
+# MAX_REGION_GAP_SECONDS belong to separate regions.
+MIN_REGION_HASHES = 200
+REGION_DENSITY = 0.2
+MIN_REGION_SECONDS = 5.0
+MAX_REGION_GAP_SECONDS = 2.0
+
+# Chunk entries kept in the index (about 0.7 MB of hashes per 120 s
+# chunk); the least recently reused are evicted beyond this
+MAX_ENTRIES = int(os.environ.get("FINGERPRINT_MAX_ENTRIES", 500))
+
+# Added chunks are merged into the sorted base every MERGE_SEGMENTS additions
+MERGE_SEGMENTS = 16
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    Hash of the raw file bytes, for exact re-uploads.
+    """
+
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def load_wav_mono(path):
+    """
+    Reads a 16-bit PCM WAV (as produced by the chunker) into
+    float32 samples in [-1, 1], averaging channels.
+    """
+
+    with wave.open(path, "rb") as w:
+        channels = w.getnchannels()
+        frames = w.readframes(w.getnframes())
+        sample_rate = w.getframerate()
+
+    samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    return samples, sample_rate
+
+
+def spectral_peaks(samples):
+    """
+    Finds prominent spectrogram peaks.
+    Returns (frame index, frequency bin) arrays sorted by frame.
+    """
+
+    if len(samples) < N_FFT:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+    num_frames = 1 + (len(samples) - N_FFT) // HOP
+    frames = np.lib.stride_tricks.as_strided(
+        samples,
+        shape=(num_frames, N_FFT),
+        strides=(samples.strides[0] * HOP, samples.strides[0])
+    )
+
+    window = np.hanning(N_FFT).astype(np.float32)
+    spectrum = np.log1p(np.abs(np.fft.rfft(frames * window, axis=1))).astype(np.float32)
+
+    # Local maxima across frequency and time
+    padded = np.pad(spectrum, 1, mode="constant", constant_values=-np.inf)
+    centre = padded[1:-1, 1:-1]
+    is_peak = (
+        (centre > padded[1:-1, :-2]) & (centre >= padded[1:-1, 2:])
+        & (centre > padded[:-2, 1:-1]) & (centre >= padded[2:, 1:-1])
+        & (centre > spectrum.mean(axis=1, keepdims=True))
+    )
+
+    # Strongest few peaks of each frame
+    strength = np.where(is_peak, spectrum, -np.inf)
+    k = min(PEAKS_PER_FRAME, strength.shape[1])
+    top_bins = np.argpartition(-strength, k - 1, axis=1)[:, :k]
+    top_strength = np.take_along_axis(strength, top_bins, axis=1)
+
+    valid = np.isfinite(top_strength)
+    frame_index = np.repeat(np.arange(num_frames), k).reshape(num_frames, k)
+
+    return frame_index[valid].astype(np.int32), top_bins[valid].astype(np.int32)
+
+
+def fingerprint(samples):
+    """
+    Combinatorial hashes of peak pairs.
+    Returns (hashes uint32, anchor frame int32).
+    """
+
+    peak_frames, peak_bins = spectral_peaks(samples)
+
+    hashes = []
+    anchors = []
+
+    for offset in range(1, FAN_OUT + 1):
+        if len(peak_frames) <= offset:
+            break
+
+        dt = peak_frames[offset:] - peak_frames[:-offset]
+        keep = (dt > 0) & (dt <= MAX_DT)
+
+        f1 = peak_bins[:-offset][keep].astype(np.uint32)
+        f2 = peak_bins[offset:][keep].astype(np.uint32)
+
+        # 10 bits per frequency bin (N_FFT // 2 + 1 <= 1024), 6 for dt
+        hashes.append((f1 << 16) | (f2 << 6) | dt[keep].astype(np.uint32))
+        anchors.append(peak_frames[:-offset][keep])
+
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32)
+
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.int32)
+
+
+def fingerprint_file(path):
+    samples, sample_rate = load_wav_mono(path)
+
+    if sample_rate != SAMPLE_RATE:
+        raise ValueError(f"Expected {SAMPLE_RATE} Hz audio, got {sample_rate} Hz")
+
+    return fingerprint(samples), len(samples) / sample_rate
+
+
+class FingerprintIndex:
+    """
+    On-disk index of audio fingerprints.
+
+    Stored in FINGERPRINT_DIR as:
+      state.json    which base generation is current
+      base_<n>/     hashes, anchor frames and entry id of every merged
+                    hash, sorted by hash (.npy, memory-mapped on load)
+      segments/     hashes added since the last merge, one small sorted
+                    file per chunk; merged into a new base in batches
+      entries.json  what each entry id is (kind "chunk"): its session,
+                    duration, model, cached Whisper result path and
+                    when it was last reused; removed entries are null
+      files.json    SHA-256 of uploaded files -> session id
+      results/      cached per-chunk Whisper results, kept outside
+                    session folders so compaction does not break reuse
+
+    Adding a chunk only sorts its own hashes. Segments are merged every
+    MERGE_SEGMENTS additions; a merge also drops entries whose session
+    or cached result is gone, and evicts the least recently used
+    entries beyond MAX_ENTRIES.
+    """
+
+    def __init__(self, folder=FINGERPRINT_DIR):
+        self.folder = folder
+        self.results_folder = os.path.join(folder, "results")
+        self.segments_folder = os.path.join(folder, "segments")
+        self.lock = threading.Lock()
+
+        os.makedirs(self.results_folder, exist_ok=True)
+        os.makedirs(self.segments_folder, exist_ok=True)
+
+        state = self._load_json("state.json", {})
+        self.base_name = state.get("base")
+        self.merged_upto = state.get("merged_upto", -1)
+
+        self.hashes, self.frames, self.entry_ids = self._load_base()
+
+        self.entries = self._load_json("entries.json", [])
+        self.files = self._load_json("files.json", {})
+
+        # Pending segments: (sequence number, hashes, frames, entry ids)
+        self.segments = []
+        for name in sorted(os.listdir(self.segments_folder)):
+            if not (name.startswith("seg_") and name.endswith(".npz")):
+                continue
+
+            seq = int(name[4:-4])
+
+            # Left over from a merge interrupted before cleanup
+            if seq <= self.merged_upto:
+                os.remove(os.path.join(self.segments_folder, name))
+                continue
+
+            with np.load(os.path.join(self.segments_folder, name)) as data:
+                self.segments.append((seq, data["hashes"], data["frames"], data["entry_ids"]))
+
+        self.next_seq = max([self.merged_upto] + [seq for seq, *_ in self.segments]) + 1
+        self._unsaved = []
+        self._json_dirty = False
+        self._needs_merge = False
+
+    def _load_base(self):
+        if self.base_name:
+            base_folder = os.path.join(self.folder, self.base_name)
+            return tuple(
+                np.load(os.path.join(base_folder, f"{name}.npy"), mmap_mode="r")
+                for name in ("hashes", "frames", "entry_ids")
+            )
+
+        # Single-file index written by earlier versions
+        legacy_file = os.path.join(self.folder, "index.npz")
+        if os.path.exists(legacy_file):
+            with np.load(legacy_file) as data:
+                self._needs_merge = True
+                return data["hashes"], data["frames"], data["entry_ids"]
+
+        return (
+            np.zeros(0, dtype=np.uint32),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.int32)
+        )
+
+    def _load_json(self, name, default):
+        path = os.path.join(self.folder, name)
+
+        if not os.path.exists(path):
+            return default
+
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_json(self, name, data):
+        path = os.path.join(self.folder, name)
+
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+        os.replace(path + ".tmp", path)
+
+    def save(self):
+        """
+        Persists new segments and metadata, merging when due.
+        Only what changed since the last save is written.
+        """
+
+        with self.lock:
+            for seq, hashes, frames, entry_ids in self._unsaved:
+                path = os.path.join(self.segments_folder, f"seg_{seq:08d}.npz")
+                np.savez(path + ".tmp.npz", hashes=hashes, frames=frames, entry_ids=entry_ids)
+                os.replace(path + ".tmp.npz", path)
+
+            self._unsaved = []
+
+            if self._needs_merge or len(self.segments) >= MERGE_SEGMENTS:
+                self._merge()
+
+            if self._json_dirty:
+                self._write_json("entries.json", self.entries)
+                self._write_json("files.json", self.files)
+                self._json_dirty = False
+
+    def _prune(self):
+        """
+        Removes entries whose session or cached result is gone, then
+        the least recently used entries beyond MAX_ENTRIES.
+        Called with the lock held.
+        """
+
+        live = []
+
+        for entry_id, entry in enumerate(self.entries):
+            if entry is None:
+                continue
+
+            session_id = entry.get("session_id")
+            session_gone = False
+            if session_id:
+                try:
+                    session_gone = not os.path.isdir(get_session_folder(session_id))
+                except ValueError:
+                    session_gone = True
+
+            if session_gone or not os.path.exists(entry.get("result_path", "")):
+                self._drop_entry(entry_id)
+            else:
+                live.append(entry_id)
+
+        if len(live) > MAX_ENTRIES:
+            live.sort(key=lambda entry_id: self.entries[entry_id].get("last_used", 0))
+
+            for entry_id in live[:len(live) - MAX_ENTRIES]:
+                self._drop_entry(entry_id)
+
+        self.files = {
+            sha256: session_id for sha256, session_id in self.files.items()
+            if os.path.isdir(os.path.join(BASE_UPLOAD_DIR, session_id))
+        }
+        self._json_dirty = True
+
+    def _drop_entry(self, entry_id):
+        result_path = self.entries[entry_id].get("result_path")
+
+        if result_path and os.path.exists(result_path):
+            os.remove(result_path)
+
+        self.entries[entry_id] = None
+        self._json_dirty = True
+
+    def _merge(self):
+        """
+        Folds all segments into a new base generation without the
+        hashes of removed entries. Called with the lock held.
+        """
+
+        self._prune()
+
+        alive = np.array([entry is not None for entry in self.entries], dtype=bool)
+
+        runs = [(self.hashes, self.frames, self.entry_ids)]
+        runs += [(hashes, frames, entry_ids) for _, hashes, frames, entry_ids in self.segments]
+
+        entry_ids = np.concatenate([np.asarray(ids) for _, _, ids in runs])
+        keep = alive[entry_ids]
+
+        hashes = np.concatenate([np.asarray(h) for h, _, _ in runs])[keep]
+        frames = np.concatenate([np.asarray(f) for _, f, _ in runs])[keep]
+        entry_ids = entry_ids[keep]
+
+        order = np.argsort(hashes, kind="stable")
+
+        merged_upto = max([self.merged_upto] + [seq for seq, *_ in self.segments])
+        base_name = f"base_{merged_upto + 1:08d}"
+        base_folder = os.path.join(self.folder, base_name)
+        os.makedirs(base_folder, exist_ok=True)
+
+        for name, array in (("hashes", hashes), ("frames", frames), ("entry_ids", entry_ids)):
+            np.save(os.path.join(base_folder, f"{name}.npy"), array[order])
+
+        # The JSON metadata must match the new base before it becomes current
+        self._write_json("entries.json", self.entries)
+        self._write_json("files.json", self.files)
+        self._json_dirty = False
+
+        self._write_json("state.json", {"base": base_name, "merged_upto": merged_upto})
+
+        old_base = self.base_name
+        self.base_name = base_name
+        self.merged_upto = merged_upto
+        self.hashes, self.frames, self.entry_ids = self._load_base()
+
+        for seq, *_ in self.segments:
+            path = os.path.join(self.segments_folder, f"seg_{seq:08d}.npz")
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.segments = []
+        self._needs_merge = False
+
+        if old_base and old_base != base_name:
+            shutil.rmtree(os.path.join(self.folder, old_base), ignore_errors=True)
+
+        legacy_file = os.path.join(self.folder, "index.npz")
+        if os.path.exists(legacy_file):
+            os.remove(legacy_file)
+
+    def add(self, hashes, frames, **entry):
+        """
+        Adds one fingerprint with its metadata. Call save() to persist.
+        """
+
+        order = np.argsort(hashes, kind="stable")
+
+        with self.lock:
+            entry_id = len(self.entries)
+            entry.setdefault("last_used", time.time())
+            self.entries.append(entry)
+
+            seq = self.next_seq
+            self.next_seq += 1
+
+            segment = (
+                seq,
+                np.asarray(hashes, dtype=np.uint32)[order],
+                np.asarray(frames, dtype=np.int32)[order],
+                np.full(len(hashes), entry_id, dtype=np.int32)
+            )
+            self.segments.append(segment)
+            self._unsaved.append(segment)
+            self._json_dirty = True
+
+        return entry_id
+
+    def touch(self, entry_id):
+        """
+        Marks an entry as reused, for least-recently-used eviction.
+        """
+
+        with self.lock:
+            if self.entries[entry_id] is not None:
+                self.entries[entry_id]["last_used"] = time.time()
+                self._json_dirty = True
+
+    def _matched_pairs(self, hashes, frames, kind=None, model_name=None):
+        """
+        Every (query hash, indexed hash) pair with equal values, over
+        live entries of the given kind and model whose cached result
+        still exists, so other entries never take part in the vote.
+        Returns (entry ids, frame offsets, query hash indices) or None.
+        """
+
+        if not len(hashes):
+            return None
+
+        with self.lock:
+            runs = [(self.hashes, self.frames, self.entry_ids)]
+            runs += [(h, f, ids) for _, h, f, ids in self.segments]
+            entries = list(self.entries)
+
+        allowed = np.array(
+            [
+                bool(e)
+                and (kind is None or e.get("kind") == kind)
+                and (model_name is None or e.get("model_name") == model_name)
+                and (not e.get("result_path") or os.path.exists(e["result_path"]))
+                for e in entries
+            ],
+            dtype=bool
+        )
+
+        if not allowed.any():
+            return None
+
+        matched_entries = []
+        offsets = []
+        query_indices = []
+
+        for db_hashes, db_frames, db_entries in runs:
+            if not len(db_hashes):
+                continue
+
+            left = np.searchsorted(db_hashes, hashes, side="left")
+            right = np.searchsorted(db_hashes, hashes, side="right")
+            counts = right - left
+
+            if not counts.sum():
+                continue
+
+            # Expand every (query hash, db occurrence) pair
+            query_index = np.repeat(np.arange(len(hashes)), counts)
+            db_index = np.repeat(left - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+            run_entries = np.asarray(db_entries[db_index])
+            keep = allowed[run_entries]
+
+            matched_entries.append(run_entries[keep])
+            offsets.append((np.asarray(db_frames[db_index]) - frames[query_index])[keep])
+            query_indices.append(query_index[keep])
+
+        if not matched_entries:
+            return None
+
+        matched_entries = np.concatenate(matched_entries)
+
+        if not len(matched_entries):
+            return None
+
+        return matched_entries, np.concatenate(offsets), np.concatenate(query_indices)
+
+    def match_region(self, hashes, frames, kind=None, model_name=None):
+        """
+        Best aligned region between a query fingerprint and one entry.
+
+        Hashes are voted per (entry, time offset) among entries of the
+        given kind and model; the winning pair's
+        matching query hashes are split wherever they are more than
+        MAX_REGION_GAP_SECONDS apart, and the largest cluster is the
+        region. Returns a dict with entry_id, offset (entry frame minus
+        query frame), first_frame / last_frame of the region in the
+        query, votes and density (votes per query hash in the region),
+        or None.
+        """
+
+        pairs = self._matched_pairs(hashes, frames, kind, model_name)
+
+        if pairs is None:
+            return None
+
+        matched_entries, offsets, query_index = pairs
+
+        keys, inverse, votes = np.unique(
+            np.stack([matched_entries, offsets], axis=1),
+            axis=0,
+            return_inverse=True,
+            return_counts=True
+        )
+        best = int(np.argmax(votes))
+
+        region_frames = np.sort(frames[query_index[inverse.ravel() == best]])
+
+        max_gap = MAX_REGION_GAP_SECONDS * SAMPLE_RATE / HOP
+        breaks = np.flatnonzero(np.diff(region_frames) > max_gap)
+        starts = np.concatenate(([0], breaks + 1))
+        ends = np.concatenate((breaks + 1, [len(region_frames)]))
+
+        largest = int(np.argmax(ends - starts))
+        first_frame = int(region_frames[starts[largest]])
+        last_frame = int(region_frames[ends[largest] - 1])
+        region_votes = int(ends[largest] - starts[largest])
+
+        in_region = np.count_nonzero((frames >= first_frame) & (frames <= last_frame))
+
+        return {
+            "entry_id": int(keys[best, 0]),
+            "offset": int(keys[best, 1]),
+            "first_frame": first_frame,
+            "last_frame": last_frame,
+            "votes": region_votes,
+            "density": region_votes / max(in_region, 1)
+        }
+
+    def lookup_file(self, sha256):
+        return self.files.get(sha256)
+
+    def add_file(self, sha256, session_id):
+        with self.lock:
+            self.files[sha256] = session_id
+            self._json_dirty = True
+
+    def result_path(self, session_id, name):
+        """
+        Where a chunk result of a session is cached.
+        """
+
+        return os.path.join(self.results_folder, f"{session_id}_{name}.json")
+
+    def remove_session(self, session_id):
+        """
+        Forgets a deleted session: its uploaded-file hashes, its chunk
+        entries and their cached results. Their hashes are dropped at
+        the next merge, which this schedules. Call save() to persist.
+        Returns the number of chunk entries removed.
+        """
+
+        with self.lock:
+            removed = [
+                entry_id for entry_id, entry in enumerate(self.entries)
+                if entry and entry.get("session_id") == session_id
+            ]
+
+            for entry_id in removed:
+                self._drop_entry(entry_id)
+
+            self.files = {
+                sha256: owner for sha256, owner in self.files.items()
+                if owner != session_id
+            }
+            self._json_dirty = True
+
+            if removed:
+                self._needs_merge = True
+
+        return len(removed)
+
+
+def find_cached_region(index, hashes, frames, model_name):
+    """
+    Looks for an earlier chunk decoded by the same model that shares
+    audio with this one: the whole chunk (a re-upload) or only part
+    of it (a repeated intro or sponsor read).
+    Returns None, or a dict with the cached Whisper result_path, the
+    shared region start / end in this chunk (seconds) and offset, the
+    cached chunk's time minus this chunk's time (seconds).
+    """
+
+    region = index.match_region(hashes, frames, kind="chunk", model_name=model_name)
+
+    if region is None:
+        return None
+
+    entry = index.entries[region["entry_id"]]
+    seconds_per_frame = HOP / SAMPLE_RATE
+
+    start = region["first_frame"] * seconds_per_frame
+    end = region["last_frame"] * seconds_per_frame + N_FFT / SAMPLE_RATE
+
+    if (
+        entry is None
+        or region["votes"] < MIN_REGION_HASHES
+        or region["density"] < REGION_DENSITY
+        or end - start < MIN_REGION_SECONDS
+    ):
+        return None
+
+    index.touch(region["entry_id"])
+
+    return {
+        "result_path": entry["result_path"],
+        "start": start,
+        "end": end,
+        "offset": region["offset"] * seconds_per_frame
+    }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_fingerprint_index():
+    """
+    Returns the shared index, loading it from disk on first use.
+    """
+
+    global _index
+
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+
+    return _index
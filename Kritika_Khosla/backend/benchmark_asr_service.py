@@ -0,0 +1,78 @@
+# backend/benchmark_asr_service.py
+#
+# Aggregate ASR throughput with N concurrent sessions, isolated
+# per-request decoding vs the shared batching service.
+# Run from the project root with a folder of short (<= 30 s) WAV chunks:
+#   python -m backend.benchmark_asr_service dataset/uploads/<session_id>/chunks 5 10 20
+
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .transcribe_all import get_whisper_model
+from .asr_service import AsrBatchingService
+
+
+def _isolated_session(chunk_paths, model_name):
+    # What each request does without the service: its own decode loop
+    # on the shared model, serialised by the model lock
+    asr_model, lock = get_whisper_model(model_name)
+    results = []
+
+    for path in chunk_paths:
+        with lock:
+            results.append(asr_model.transcribe(path, temperature=0.0))
+
+    return results
+
+
+def run_concurrent(num_sessions, session_fn):
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=num_sessions) as pool:
+        list(pool.map(lambda _: session_fn(), range(num_sessions)))
+
+    return time.perf_counter() - start
+
+
+def benchmark_asr_service(chunk_paths, concurrency=(5, 10, 20), model_name="base"):
+    service = AsrBatchingService(model_name)
+    report = []
+
+    for num_sessions in concurrency:
+        total_chunks = num_sessions * len(chunk_paths)
+
+        isolated = run_concurrent(
+            num_sessions,
+            lambda: _isolated_session(chunk_paths, model_name)
+        )
+        batched = run_concurrent(
+            num_sessions,
+            lambda: service.transcribe_many(None, chunk_paths)
+        )
+
+        report.append({
+            "sessions": num_sessions,
+            "chunks": total_chunks,
+            "isolated_chunks_per_second": round(total_chunks / isolated, 2),
+            "batched_chunks_per_second": round(total_chunks / batched, 2),
+            "speedup": round(isolated / batched, 2)
+        })
+
+    return {"runs": report, "service_stats": service.stats}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m backend.benchmark_asr_service <chunks_folder> [sessions ...]")
+        sys.exit(1)
+
+    folder = sys.argv[1]
+    paths = sorted(
+        os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".wav")
+    )
+    concurrency = [int(n) for n in sys.argv[2:]] or [5, 10, 20]
+
+    print(json.dumps(benchmark_asr_service(paths, concurrency), indent=4))
@@ -0,0 +1,73 @@
+# backend/benchmark_embeddings.py
+#
+# Compares the PyTorch and int8 ONNX embedding backends.
+# Run from the project root:
+#   python -m backend.benchmark_embeddings dataset/uploads/<session_id>/segmented/sentences.json
+
+import sys
+import json
+import time
+import numpy as np
+
+from .topic_segmentation_embeddings import get_embedding_model
+
+
+def time_encode(model, sentences, repeats=3):
+    """
+    Returns (best seconds, embeddings) over a few runs.
+    """
+
+    best = None
+    embeddings = None
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings = model.encode(sentences, normalize_embeddings=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, np.asarray(embeddings, dtype=np.float32)
+
+
+def benchmark_embeddings(sentences, model_name="all-MiniLM-L6-v2", repeats=3):
+    """
+    Reports throughput of both backends and their cosine agreement.
+    """
+
+    report = {"sentences": len(sentences)}
+    outputs = {}
+
+    for backend in ("torch", "onnx"):
+        model = get_embedding_model(model_name, backend)
+
+        # Warm-up so one-off graph setup is not timed
+        model.encode(sentences[:8], normalize_embeddings=True)
+
+        seconds, embeddings = time_encode(model, sentences, repeats)
+        outputs[backend] = embeddings
+        report[backend] = {
+            "seconds": round(seconds, 3),
+            "sentences_per_second": round(len(sentences) / seconds, 1)
+        }
+
+    agreement = np.einsum("ij,ij->i", outputs["torch"], outputs["onnx"])
+
+    report["cosine_agreement"] = {
+        "mean": round(float(agreement.mean()), 4),
+        "min": round(float(agreement.min()), 4),
+        "p01": round(float(np.percentile(agreement, 1)), 4)
+    }
+    report["speedup"] = round(report["torch"]["seconds"] / report["onnx"]["seconds"], 2)
+
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m backend.benchmark_embeddings <sentences.json>")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        sentences = json.load(f)
+
+    print(json.dumps(benchmark_embeddings(sentences), indent=4))
@@ -0,0 +1,139 @@
+# backend/benchmark_serialization.py
+#
+# Encode time and payload size of the result/metadata serializers
+# on a synthetic corpus, plus streaming JSONL/Parquet export and
+# lazy read-back. Run from the project root:
+#   python -m backend.benchmark_serialization [num_segments]
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+
+from . import serialization
+from .serialization import (
+    dumps_json,
+    dumps_msgpack,
+    compress,
+    write_jsonl,
+    iter_jsonl,
+    write_parquet,
+    iter_parquet
+)
+
+WORDS = (
+    "market growth podcast guest interview startup product team data model "
+    "research climate energy policy health music story science future"
+).split()
+
+
+def synthetic_segments(num_segments, seed=0):
+    """
+    Segment records shaped like the corpus metadata.
+    """
+
+    rng = random.Random(seed)
+
+    for i in range(num_segments):
+        start = i * 90.0
+
+        yield {
+            "episode_id": str(i // 20),
+            "episode_title": f"Episode {i // 20}",
+            "segment_id": i,
+            "local_segment_id": i % 20,
+            "title": " ".join(rng.sample(WORDS, 3)).title(),
+            "summary": " ".join(rng.choice(WORDS) for _ in range(60)) + ".",
+            "keywords": rng.sample(WORDS, 5),
+            "sentiment": {
+                "label": rng.choice(["Positive", "Neutral", "Negative"]),
+                "score": round(rng.uniform(-1, 1), 2)
+            },
+            "time": {"start": start, "end": start + rng.uniform(30, 90)}
+        }
+
+
+def _timed(fn, repeat=3):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return output, best
+
+
+def benchmark_encoders(records):
+    encoders = {
+        "json_indent": lambda: json.dumps(records, indent=2).encode("utf-8"),
+        "json_compact": lambda: dumps_json(records)
+    }
+
+    if serialization.msgpack is not None:
+        encoders["msgpack"] = lambda: dumps_msgpack(records)
+
+    encodings = ["gzip"] + (["zstd"] if serialization.zstandard is not None else [])
+    report = []
+
+    for name, encode in encoders.items():
+        body, seconds = _timed(encode)
+        row = {"format": name, "encode_ms": round(seconds * 1000, 1), "bytes": len(body)}
+
+        for encoding in encodings:
+            compressed, seconds = _timed(lambda: compress(body, encoding))
+            row[f"{encoding}_ms"] = round(seconds * 1000, 1)
+            row[f"{encoding}_bytes"] = len(compressed)
+
+        report.append(row)
+
+    return {"json_backend": "orjson" if serialization.orjson else "json", "encoders": report}
+
+
+def benchmark_exports(num_segments):
+    report = []
+
+    with tempfile.TemporaryDirectory() as folder:
+        exports = {"jsonl": (write_jsonl, iter_jsonl)}
+
+        try:
+            import pyarrow   # noqa: F401
+            exports["parquet"] = (write_parquet, iter_parquet)
+        except ImportError:
+            pass
+
+        for name, (write, read) in exports.items():
+            path = os.path.join(folder, f"segments.{name}")
+
+            start = time.perf_counter()
+            write(synthetic_segments(num_segments), path)
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            count = sum(1 for _ in read(path))
+            read_seconds = time.perf_counter() - start
+
+            report.append({
+                "format": name,
+                "records": count,
+                "write_s": round(write_seconds, 3),
+                "lazy_read_s": round(read_seconds, 3),
+                "bytes": os.path.getsize(path)
+            })
+
+    return report
+
+
+if __name__ == "__main__":
+    num_segments = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    records = list(synthetic_segments(num_segments))
+
+    print(json.dumps({
+        "segments": num_segments,
+        "in_memory": benchmark_encoders(records),
+        "streaming_export": benchmark_exports(num_segments)
+    }, indent=4))
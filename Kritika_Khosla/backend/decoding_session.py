@@ -0,0 +1,195 @@
+# backend/decoding_session.py
+
+import time
+import numpy as np
+import whisper
+
+# Whisper's default temperature schedule
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+# Chunks quieter than this (RMS of samples in [-1, 1]) hold no speech
+SILENCE_RMS = 0.005
+
+# Language probability needed to stop looking at further chunks
+LANGUAGE_CONFIDENCE = 0.5
+
+
+class DecodingSession:
+    """
+    Decoding context shared by all chunks of one episode.
+
+    - Language is detected once, from the first speech-bearing chunk,
+      and passed to every chunk instead of being re-detected.
+    - The tail of the previous chunk's text is carried forward as the
+      next chunk's initial prompt.
+    - Decode options and the temperature fallback schedule are set
+      once; temperatures=(0.0,) disables fallback.
+
+    Time spent on language detection and on fallback retries (decodes
+    at temperature > 0) is measured and exposed through timings().
+    """
+
+    def __init__(
+        self,
+        model,
+        lock,
+        language=None,
+        decode_options=None,
+        temperatures=DEFAULT_TEMPERATURES,
+        carry_prompt=True,
+        prompt_chars=224
+    ):
+        self.model = model
+        self.lock = lock
+        self.language = language
+        self.decode_options = dict(decode_options or {})
+        self.temperatures = tuple(temperatures)
+        self.carry_prompt = carry_prompt
+        self.prompt_chars = prompt_chars
+        self.previous_text = ""
+
+        self.language_detection_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.decode_calls = 0
+        self.fallback_retries = 0
+        self.fallback_seconds = 0.0
+
+        # Chunks decoded without per-attempt timing (stub model, worker
+        # pool, ASR service); their fallback retries are unknown
+        self.unmeasured_chunks = 0
+
+    def detect_language(self, file_paths):
+        """
+        Detects the episode language from the first chunk with speech.
+        Returns the language code, or None if nothing could be detected.
+        """
+
+        if self.language:
+            return self.language
+
+        start = time.perf_counter()
+        best = None
+
+        n_mels = getattr(self.model.dims, "n_mels", 80)
+
+        for file_path in file_paths:
+            audio = whisper.load_audio(file_path)
+
+            if not len(audio) or np.sqrt(np.mean(audio ** 2)) < SILENCE_RMS:
+                continue
+
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels)
+
+            with self.lock:
+                _, probs = self.model.detect_language(mel.to(self.model.device))
+
+            language = max(probs, key=probs.get)
+
+            if best is None or probs[language] > best[1]:
+                best = (language, probs[language])
+
+            if probs[language] >= LANGUAGE_CONFIDENCE:
+                break
+
+        self.language_detection_seconds += time.perf_counter() - start
+
+        if best is not None:
+            self.language = best[0]
+
+        return self.language
+
+    def chunk_options(self):
+        """
+        Decode options for the next chunk.
+        """
+
+        options = dict(self.decode_options)
+        options["temperature"] = self.temperatures
+
+        if self.language:
+            options["language"] = self.language
+
+        if self.carry_prompt and self.previous_text:
+            options["initial_prompt"] = self.previous_text[-self.prompt_chars:]
+
+        return options
+
+    def _timed_decode(self, original_decode):
+        """
+        Wraps model.decode to time every attempt of Whisper's
+        fallback loop; attempts above temperature 0 are retries.
+        """
+
+        def decode(mel, options, *args, **kwargs):
+            start = time.perf_counter()
+            result = original_decode(mel, options, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            self.decode_calls += 1
+
+            if getattr(options, "temperature", 0.0) > 0 and len(self.temperatures) > 1:
+                self.fallback_retries += 1
+                self.fallback_seconds += elapsed
+
+            return result
+
+        return decode
+
+    def transcribe(self, file_path):
+        """
+        Transcribes one chunk within the episode context.
+        """
+
+        options = self.chunk_options()
+        start = time.perf_counter()
+
+        # Models without a decode step (the ASR stub) are not timed per attempt
+        timed = hasattr(self.model, "decode")
+
+        with self.lock:
+            if timed:
+                self.model.decode = self._timed_decode(self.model.decode)
+            try:
+                result = self.model.transcribe(file_path, **options)
+            finally:
+                if timed:
+                    # Drop the instance override, back to the class method
+                    del self.model.decode
+
+        self.decode_seconds += time.perf_counter() - start
+
+        if not timed:
+            self.unmeasured_chunks += 1
+
+        if self.language is None:
+            self.language = result.get("language")
+
+        self.previous_text = result["text"].strip()
+
+        return result
+
+    def record_external(self, chunks, seconds):
+        """
+        Accounts for chunks decoded outside this session (worker pool,
+        ASR service): their wall time counts, fallback is not measured.
+        """
+
+        self.decode_seconds += seconds
+        self.unmeasured_chunks += chunks
+
+    def timings(self):
+        """
+        Decode timings; the fallback fields are None when some chunks
+        were decoded without per-attempt timing, rather than a
+        misleading 0.
+        """
+
+        measured = self.unmeasured_chunks == 0
+
+        return {
+            "language": self.language,
+            "language_detection_seconds": round(self.language_detection_seconds, 3),
+            "decode_seconds": round(self.decode_seconds, 3),
+            "fallback_retries": self.fallback_retries if measured else None,
+            "fallback_seconds": round(self.fallback_seconds, 3) if measured else None
+        }
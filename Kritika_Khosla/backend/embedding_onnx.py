@@ -0,0 +1,177 @@
+# backend/embedding_onnx.py
+
+import os
+import numpy as np
+
+MODEL_DIR = os.path.join("models", "onnx")
+
+# Same limit SentenceTransformer uses for all-MiniLM-L6-v2
+MAX_SEQ_LENGTH = 256
+
+
+def _hub_name(model_name):
+    """
+    SentenceTransformer short names live under sentence-transformers/ on the hub.
+    """
+
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def quantized_model_path(model_name, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, model_name.replace("/", "_"), "model_int8.onnx")
+
+
+def export_quantized_model(model_name="all-MiniLM-L6-v2", model_dir=MODEL_DIR):
+    """
+    Exports the transformer behind a SentenceTransformer model to ONNX
+    and quantizes its weights to int8.
+    Returns the quantized model path.
+    """
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    output_path = quantized_model_path(model_name, model_dir)
+    output_folder = os.path.dirname(output_path)
+    os.makedirs(output_folder, exist_ok=True)
+
+    fp32_path = os.path.join(output_folder, "model_fp32.onnx")
+
+    tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+    model = AutoModel.from_pretrained(_hub_name(model_name))
+    model.eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    quantize_dynamic(fp32_path, output_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_folder)
+
+    os.remove(fp32_path)
+
+    print("Quantized ONNX model saved:", output_path)
+
+    return output_path
+
+
+class OnnxSentenceEncoder:
+    """
+    Drop-in replacement for SentenceTransformer.encode() running
+    the int8 ONNX export through onnxruntime.
+
+    Sentences are sorted by token length and grouped into batches
+    bounded by a token budget, so each batch is padded only to its
+    own longest sentence.
+    """
+
+    def __init__(
+        self,
+        model_name="all-MiniLM-L6-v2",
+        model_dir=MODEL_DIR,
+        max_batch_size=128,
+        max_batch_tokens=8192,
+        num_threads=None
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = quantized_model_path(model_name, model_dir)
+
+        if not os.path.exists(model_path):
+            model_path = export_quantized_model(model_name, model_dir)
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(model_path))
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+
+    def _length_batches(self, lengths):
+        """
+        Yields index arrays of sentences with similar token lengths.
+        """
+
+        order = np.argsort(lengths, kind="stable")
+        batch = []
+
+        for idx in order:
+            # Sorted ascending, so the new sentence sets the padded length
+            padded_tokens = lengths[idx] * (len(batch) + 1)
+
+            if batch and (len(batch) >= self.max_batch_size or padded_tokens > self.max_batch_tokens):
+                yield np.array(batch)
+                batch = []
+
+            batch.append(idx)
+
+        if batch:
+            yield np.array(batch)
+
+    def encode(self, sentences, normalize_embeddings=True, **kwargs):
+        """
+        Encodes sentences into a float32 matrix in input order.
+        """
+
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        encoded = self.tokenizer(
+            list(sentences),
+            truncation=True,
+            max_length=MAX_SEQ_LENGTH
+        )
+        lengths = np.array([len(ids) for ids in encoded["input_ids"]])
+
+        embeddings = None
+
+        for batch in self._length_batches(lengths):
+            width = lengths[batch].max()
+            inputs = {}
+
+            for name in ("input_ids", "attention_mask", "token_type_ids"):
+                if name not in self.input_names:
+                    continue
+                padded = np.zeros((len(batch), width), dtype=np.int64)
+                for row, idx in enumerate(batch):
+                    values = encoded[name][idx]
+                    padded[row, :len(values)] = values
+                inputs[name] = padded
+
+            hidden = self.session.run(None, inputs)[0]
+
+            # Mean pooling over real tokens, as in the SentenceTransformer model
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+            if embeddings is None:
+                embeddings = np.empty((len(sentences), pooled.shape[1]), dtype=np.float32)
+
+            embeddings[batch] = pooled
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+
+        return embeddings
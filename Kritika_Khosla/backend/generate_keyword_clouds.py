@@ -1,6 +1,18 @@
 import os
+import json
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from wordcloud import WordCloud
-import matplotlib.pyplot as plt
+
+CLOUD_CACHE_DIR = os.path.join("dataset", "keyword_clouds")
+
+# Render processes; each is a copy of the server, so keep this small
+CLOUD_RENDER_WORKERS = int(os.getenv("CLOUD_RENDER_WORKERS", "2"))
+
+CLOUD_WIDTH = 800
+CLOUD_HEIGHT = 400
 
 
 def generate_keyword_cloud(input_path,
@@ -10,6 +22,8 @@ def generate_keyword_cloud(input_path,
     Returns generated image path.
     """
 
+    import matplotlib.pyplot as plt
+
     os.makedirs(output_folder, exist_ok=True)
 
     # Read keyword text
@@ -41,6 +55,97 @@ def generate_keyword_cloud(input_path,
     return output_path
 
 
+def keyword_cloud_key(weights):
+    """
+    Content hash of keyword weights and render settings.
+    Identical weights always map to the same cached image.
+    """
+
+    payload = json.dumps(
+        [sorted(weights.items()), CLOUD_WIDTH, CLOUD_HEIGHT],
+        ensure_ascii=False
+    )
+
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def render_keyword_cloud(weights, cache_dir=CLOUD_CACHE_DIR):
+    """
+    Renders a cloud straight from keyword weights to PNG, without
+    matplotlib. Returns the cached image path.
+    weights: {keyword: weight}
+    """
+
+    if not weights:
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    output_path = os.path.join(cache_dir, keyword_cloud_key(weights) + ".png")
+
+    if os.path.exists(output_path):
+        return output_path
+
+    image = WordCloud(
+        width=CLOUD_WIDTH,
+        height=CLOUD_HEIGHT,
+        background_color="white"
+    ).generate_from_frequencies(weights).to_image()
+
+    # Temp file + rename so readers never see a partial PNG
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    image.save(tmp_path, format="PNG")
+    os.replace(tmp_path, output_path)
+
+    return output_path
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render_session_clouds(topics, cache_dir=CLOUD_CACHE_DIR, workers=CLOUD_RENDER_WORKERS):
+    """
+    Renders every topic cloud of a session in a process pool.
+    Already-cached clouds are skipped. Returns image paths in topic order.
+    """
+
+    global _pool
+
+    weights = [topic.get("keyword_weights") or {} for topic in topics]
+    paths = [None] * len(weights)
+    missing = []
+
+    for i, w in enumerate(weights):
+        cached = os.path.join(cache_dir, keyword_cloud_key(w) + ".png") if w else None
+        if cached and os.path.exists(cached):
+            paths[i] = cached
+        elif w:
+            missing.append(i)
+
+    if not missing:
+        return paths
+
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, as the server process has live threads
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    rendered = _pool.map(
+        render_keyword_cloud,
+        [weights[i] for i in missing],
+        [cache_dir] * len(missing)
+    )
+
+    for i, path in zip(missing, rendered):
+        paths[i] = path
+
+    return paths
+
+
 # Optional: run on entire folder if executed directly
 if __name__ == "__main__":
     keywords_dir = "../dataset/topic_keywords"
@@ -49,4 +154,4 @@ if __name__ == "__main__":
         if file.endswith("_keywords.txt"):
             generate_keyword_cloud(os.path.join(keywords_dir, file))
 
-    print("All keyword clouds generated.")
\ No newline at end of file
+    print("All keyword clouds generated.")
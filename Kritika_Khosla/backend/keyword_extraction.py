@@ -1,33 +1,16 @@
 # backend/keyword_extraction.py
 
-import re
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+# Only real words (min 3 letters), so digits never become keywords
+KEYWORD_TOKEN_PATTERN = r"\b[a-zA-Z]{3,}\b"
 
-def clean_text_for_keywords(text):
-    """
-    Remove timestamps, numbers, and unwanted tokens
-    """
-
-    # Remove timestamp patterns like [8.80 - 14.48]
-    text = re.sub(r"\[\d+(\.\d+)?\s*-\s*\d+(\.\d+)?\]", " ", text)
-
-    # Remove standalone numbers
-    text = re.sub(r"\b\d+\b", " ", text)
-
-    # Remove decimal numbers
-    text = re.sub(r"\b\d+\.\d+\b", " ", text)
 
-    # Remove extra spaces
-    text = re.sub(r"\s+", " ", text)
-
-    return text.strip()
-
-
-def extract_keywords(input_data, max_keywords=10):
+def extract_keywords(input_data, max_keywords=10, with_scores=False):
     """
     Extract meaningful TF-IDF keywords from text.
-    Returns list of clean keywords.
+    Returns list of clean keywords, or (keyword, weight) pairs
+    if with_scores=True.
     """
 
     if not isinstance(input_data, str):
@@ -39,13 +22,12 @@ def extract_keywords(input_data, max_keywords=10):
         return []
 
     try:
-        # 🔥 Clean timestamps & numbers first
-        text = clean_text_for_keywords(text)
-
+        # Timestamps and numbers never match the token pattern,
+        # so the text is vectorized as-is without a cleaned copy
         vectorizer = TfidfVectorizer(
             stop_words="english",
             max_features=50,
-            token_pattern=r"\b[a-zA-Z]{3,}\b"  # only real words (min 3 letters)
+            token_pattern=KEYWORD_TOKEN_PATTERN
         )
 
         tfidf = vectorizer.fit_transform([text])
@@ -54,13 +36,12 @@ def extract_keywords(input_data, max_keywords=10):
 
         # Sort by score
         sorted_indices = scores.argsort()[::-1]
-        top_keywords = [
-            feature_names[i]
-            for i in sorted_indices[:max_keywords]
-            if scores[i] > 0
-        ]
+        top_indices = [i for i in sorted_indices[:max_keywords] if scores[i] > 0]
+
+        if with_scores:
+            return [(str(feature_names[i]), round(float(scores[i]), 4)) for i in top_indices]
 
-        return top_keywords
+        return [feature_names[i] for i in top_indices]
 
     except Exception as e:
         print("Keyword extraction error:", e)
@@ -0,0 +1,297 @@
+# backend/loadtest.py
+#
+# Load test for /analyze/: starts the backend with uvicorn, generates
+# synthetic speech-like WAV files offline and drives N concurrent
+# clients with httpx. Reports throughput, latency percentiles, error
+# rate and server RSS over time.
+# Run from the project root, e.g. with the stub ASR model:
+#   python -m backend.loadtest --clients 8 --requests 5 --seconds 30 120 --stub
+
+import os
+import io
+import sys
+import json
+import time
+import wave
+import asyncio
+import argparse
+import subprocess
+
+import numpy as np
+import httpx
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_speech(duration_s, seed=0):
+    """
+    Speech-like test signal: voiced "syllables" (harmonics of a
+    wandering pitch, ~4 per second) separated by short pauses,
+    over low background noise. Returns 16-bit PCM samples.
+    """
+
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration_s * SAMPLE_RATE)
+    t = np.arange(num_samples) / SAMPLE_RATE
+
+    syllable = SAMPLE_RATE // 4
+    num_syllables = -(-num_samples // syllable)
+
+    pitch = np.repeat(rng.uniform(90, 220, num_syllables), syllable)[:num_samples]
+    voiced = np.repeat(rng.random(num_syllables) > 0.2, syllable)[:num_samples]
+    envelope = np.tile(np.hanning(syllable), num_syllables)[:num_samples] * voiced
+
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 6)) * envelope
+    signal += 0.02 * rng.standard_normal(num_samples)
+    signal += 0.001 * np.sin(2 * np.pi * 50 * t)
+
+    signal /= max(np.abs(signal).max(), 1e-9)
+
+    return (signal * 0.6 * 32767).astype(np.int16)
+
+
+def wav_bytes(samples):
+    buffer = io.BytesIO()
+
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(samples.tobytes())
+
+    return buffer.getvalue()
+
+
+def process_rss(pid):
+    """
+    Resident memory (bytes) of a process and its children
+    (ASR worker processes), via psutil or /proc.
+    """
+
+    try:
+        import psutil
+
+        process = psutil.Process(pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes if p.is_running())
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    total = None
+
+    for child_pid in [pid] + _proc_descendants(pid):
+        try:
+            with open(f"/proc/{child_pid}/status", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total = (total or 0) + int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            # Exited since it was listed; only the server itself must exist
+            if child_pid == pid:
+                return None
+
+    return total
+
+
+def _proc_descendants(pid):
+    """
+    Child process ids, recursively, from /proc/<pid>/task/*/children.
+    """
+
+    descendants = []
+    pending = [pid]
+
+    while pending:
+        parent = pending.pop()
+
+        try:
+            tasks = os.listdir(f"/proc/{parent}/task")
+        except OSError:
+            continue
+
+        for task in tasks:
+            try:
+                with open(f"/proc/{parent}/task/{task}/children", encoding="utf-8") as f:
+                    children = [int(child) for child in f.read().split()]
+            except OSError:
+                continue
+
+            descendants.extend(children)
+            pending.extend(children)
+
+    return descendants
+
+
+def start_server(port, stub=False, extra_env=None):
+    env = dict(os.environ)
+    if stub:
+        env["ASR_STUB"] = "1"
+    env.update(extra_env or {})
+
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--log-level", "warning"
+    ]
+
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_until_ready(base_url, server, timeout_s=300):
+    deadline = time.monotonic() + timeout_s
+
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+
+            try:
+                if (await client.get(base_url + "/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+
+            await asyncio.sleep(0.5)
+
+    raise TimeoutError("Server did not start in time")
+
+
+async def sample_rss(pid, interval_s, samples, start, stop):
+    while not stop.is_set():
+        rss = process_rss(pid)
+        if rss is not None:
+            samples.append({"t": round(time.perf_counter() - start, 2), "rss_mb": round(rss / 2**20, 1)})
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval_s)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_client(client, client_id, args, results):
+    for k in range(args.requests):
+        duration = args.seconds[(client_id + k) % len(args.seconds)]
+
+        # Unique audio per request unless cache paths are under test
+        seed = 0 if args.repeat_audio else client_id * 100003 + k
+        body = await asyncio.to_thread(wav_bytes, synthetic_speech(duration, seed))
+
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                "/analyze/",
+                params={"mode": args.mode, "segmentation": args.segmentation},
+                files={"file": (f"load_{client_id}_{k}.wav", body, "audio/wav")}
+            )
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+
+        results.append({
+            "client": client_id,
+            "audio_seconds": duration,
+            "latency_s": time.perf_counter() - start,
+            "status": status
+        })
+
+
+def summarize(results, wall_s, rss_samples):
+    latencies = np.array([r["latency_s"] for r in results]) if results else np.zeros(1)
+    errors = [r for r in results if r["status"] != 200]
+
+    return {
+        "requests": len(results),
+        "wall_seconds": round(wall_s, 2),
+        "throughput_rps": round(len(results) / wall_s, 3) if wall_s else 0.0,
+        "audio_seconds_per_second": round(sum(r["audio_seconds"] for r in results) / wall_s, 2) if wall_s else 0.0,
+        "latency_s": {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+            "max": round(float(latencies.max()), 3)
+        },
+        "error_rate": round(len(errors) / len(results), 3) if results else 0.0,
+        "errors": sorted({str(r["status"]) for r in errors}),
+        "peak_rss_mb": max((s["rss_mb"] for s in rss_samples), default=None),
+        "rss_over_time": rss_samples
+    }
+
+
+async def run_load_test(args):
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    server = None
+
+    if not args.url:
+        server = start_server(args.port, stub=args.stub)
+
+    try:
+        if server is not None:
+            await wait_until_ready(base_url, server)
+
+        results, rss_samples = [], []
+        stop = asyncio.Event()
+        start = time.perf_counter()
+
+        sampler = None
+        if server is not None:
+            sampler = asyncio.create_task(
+                sample_rss(server.pid, args.rss_interval, rss_samples, start, stop)
+            )
+
+        limits = httpx.Limits(max_connections=args.clients)
+
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await asyncio.gather(*(
+                run_client(client, client_id, args, results)
+                for client_id in range(args.clients)
+            ))
+
+        wall_s = time.perf_counter() - start
+
+        stop.set()
+        if sampler is not None:
+            await sampler
+
+        return summarize(results, wall_s, rss_samples)
+
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the /analyze/ endpoint")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=3, help="requests per client")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[30.0], help="audio durations, cycled")
+    parser.add_argument("--mode", default="full", choices=["full", "preview"])
+    parser.add_argument("--segmentation", default="fast")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="test an already running server instead of starting one")
+    parser.add_argument("--stub", action="store_true", help="start the server with ASR_STUB=1")
+    parser.add_argument("--repeat-audio", action="store_true", help="send the same audio every time")
+    parser.add_argument("--rss-interval", type=float, default=1.0, help="seconds between RSS samples")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout (s)")
+    parser.add_argument("--output", help="also write the report to this JSON file")
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(run_load_test(args))
+
+    print(json.dumps(report, indent=4))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
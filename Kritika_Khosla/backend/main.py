@@ -1,33 +1,150 @@
 # backend/main.py
 
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Query, Body, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, PlainTextResponse
 import os
 import uuid
+import asyncio
 from datetime import datetime
 import shutil
+from itertools import product
 
-from .pipeline import run_full_pipeline   # ✅ use relative import inside backend
+from .pipeline import (   # ✅ use relative import inside backend
+    run_full_pipeline,
+    run_preview_pipeline,
+    refine_session,
+    resegment_session,
+    SEGMENTERS,
+    MIN_BLOCKS_PER_TOPIC,
+    SIMILARITY_DROP_PERCENTILE
+)
+from .sessions import (
+    BASE_UPLOAD_DIR,
+    get_session_folder,
+    load_session_result,
+    open_session_file,
+    write_session_state
+)
+from .transcribe_all import TRANSCRIPT_STORE_FILE, get_whisper_model
+from .audio_fingerprint import file_sha256, get_fingerprint_index
+from .generate_keyword_clouds import render_keyword_cloud, render_session_clouds
+from .transcript_store import TranscriptStore
+from .serialization import encode_payload
+from .profiling import COLLAPSED_FILE, SUMMARY_FILE, profile_session, should_profile
+from .retention import INTERVAL_MINUTES, run_retention_once, last_retention_report
 
 app = FastAPI(title="PodIntel AI")
 
-BASE_UPLOAD_DIR = os.path.join("dataset", "uploads")
 os.makedirs(BASE_UPLOAD_DIR, exist_ok=True)
 
+# Largest parameter grid accepted by /resegment
+MAX_RESEGMENT_CONFIGS = 100
+
+
+def negotiated_response(request, content):
+    """
+    Result payloads in the format (JSON or MessagePack) and
+    compression (zstd or gzip) the client accepts.
+    """
+
+    body, headers = encode_payload(
+        content,
+        accept=request.headers.get("accept"),
+        accept_encoding=request.headers.get("accept-encoding")
+    )
+
+    return Response(content=body, headers=headers)
+
+
+async def retention_loop():
+    """
+    Compacts and expires old sessions every INTERVAL_MINUTES.
+    """
+
+    while True:
+        await asyncio.sleep(INTERVAL_MINUTES * 60)
+
+        try:
+            await asyncio.to_thread(run_retention_once)
+        except Exception as e:
+            print("Retention error:", str(e))
+
+
+@app.on_event("startup")
+async def load_asr_model():
+    # Loaded once here rather than on the first request
+    print("Loading Whisper model (this happens only once)...")
+    await asyncio.to_thread(get_whisper_model, "base")
+
+
+@app.on_event("startup")
+async def start_retention():
+    if INTERVAL_MINUTES > 0:
+        asyncio.create_task(retention_loop())
+
 
 @app.get("/")
 def home():
     return {"message": "PodIntel AI Backend Running 🚀"}
 
 
+def is_reusable_result(state, mode, segmentation):
+    # Sessions from before segmentation was selectable used embeddings
+    if state.get("segmentation", "embeddings") != segmentation:
+        return False
+
+    return mode == "preview" or state.get("current_version") == "final"
+
+
+def save_upload(source, file_path):
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+
+def run_analysis(file_path, session_id, mode, segmentation, profiled):
+    """
+    Runs the pipeline for one upload. Called in a worker thread so
+    the event loop keeps serving other requests; the profiler samples
+    this thread, where the pipeline runs.
+    """
+
+    with profile_session(get_session_folder(session_id), profiled):
+        if mode == "preview":
+            # Draft now, full-model refinement after the response is sent
+            return run_preview_pipeline(file_path, session_id, segmentation)
+
+        return run_full_pipeline(file_path, session_id, segmentation)
+
+
 @app.post("/analyze/")
-async def analyze_audio(file: UploadFile = File(...)):
+async def analyze_audio(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    mode: str = Query("full"),
+    segmentation: str = Query("embeddings"),
+    profile: bool = Query(False)
+):
+    if mode not in ("full", "preview"):
+        return JSONResponse(
+            status_code=400,
+            content={"error": "mode must be 'full' or 'preview'"}
+        )
+
+    if segmentation not in SEGMENTERS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "segmentation must be one of: " + ", ".join(SEGMENTERS)}
+        )
+
+    session_id = None
+
     try:
         # ✅ Generate unique session id
         session_id = datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + str(uuid.uuid4())[:6]
 
         # ✅ Create session folder
-        session_folder = os.path.join(BASE_UPLOAD_DIR, session_id)
+        session_folder = get_session_folder(session_id)
         os.makedirs(session_folder, exist_ok=True)
 
         # ✅ Clean filename (avoid path issues)
@@ -36,22 +153,289 @@ async def analyze_audio(file: UploadFile = File(...)):
         file_path = os.path.join(session_folder, filename)
 
         # ✅ Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await asyncio.to_thread(save_upload, file.file, file_path)
 
-        # ✅ Run pipeline
-        result = run_full_pipeline(file_path, session_id)
+        # ✅ Same bytes uploaded before: return that session's result
+        file_hash = await asyncio.to_thread(file_sha256, file_path)
+        fingerprint_index = get_fingerprint_index()
+        previous_session = fingerprint_index.lookup_file(file_hash)
 
-        return JSONResponse(
-            content={
+        if previous_session:
+            state, previous_result = load_session_result(previous_session)
+
+            # Only a result of the same segmenter answers this request, and a
+            # draft only answers a preview; otherwise fall through to the
+            # pipeline, which still reuses the cached chunk transcripts
+            if previous_result is not None and is_reusable_result(state, mode, segmentation):
+                shutil.rmtree(session_folder, ignore_errors=True)
+
+                return negotiated_response(
+                    request,
+                    {
+                        "session_id": previous_session,
+                        "version": state.get("current_version"),
+                        "duplicate": True,
+                        "skipped_fraction": 1.0,
+                        "result": previous_result
+                    }
+                )
+
+        fingerprint_index.add_file(file_hash, session_id)
+        await asyncio.to_thread(fingerprint_index.save)
+
+        # ✅ Run pipeline off the event loop (profiled on request, see GET /sessions/{id}/profile)
+        result = await asyncio.to_thread(
+            run_analysis,
+            file_path,
+            session_id,
+            mode,
+            segmentation,
+            should_profile(profile)
+        )
+
+        if mode == "preview":
+            background_tasks.add_task(refine_session, session_id)
+
+        # Pre-render keyword clouds so the first view is a cache hit
+        background_tasks.add_task(render_session_clouds, result["topics"])
+
+        return negotiated_response(
+            request,
+            {
                 "session_id": session_id,
+                "version": result["version"],
                 "result": result
             }
         )
 
     except Exception as e:
         print("ERROR:", str(e))   # helpful for debugging
+
+        # Lets retention clean the session up instead of waiting on it
+        if session_id and os.path.isdir(get_session_folder(session_id)):
+            write_session_state(session_id, status="failed", error=str(e))
+
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
-        )
\ No newline at end of file
+        )
+
+
+@app.get("/sessions/{session_id}")
+def get_session(request: Request, session_id: str):
+    """
+    Returns the current result of a session and whether it is draft or final.
+    """
+
+    try:
+        state, result = load_session_result(session_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if state is None:
+        return JSONResponse(status_code=404, content={"error": "Session not found"})
+
+    return negotiated_response(
+        request,
+        {
+            "session_id": session_id,
+            "version": state.get("current_version"),
+            "status": state.get("status"),
+            "result": result
+        }
+    )
+
+
+@app.get("/sessions/{session_id}/seek")
+def seek_session(session_id: str, t: float = Query(..., ge=0)):
+    """
+    Returns the sentence playing at time t (seconds).
+    """
+
+    try:
+        state, _ = load_session_result(session_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if state is None:
+        return JSONResponse(status_code=404, content={"error": "Session not found"})
+
+    store_path = os.path.join("transcripts", TRANSCRIPT_STORE_FILE)
+    if state.get("current_version") == "draft":
+        store_path = os.path.join("draft", store_path)
+
+    # Compacted sessions serve it from their archive
+    store_file = open_session_file(session_id, store_path)
+
+    if store_file is None:
+        return JSONResponse(status_code=404, content={"error": "No timestamped transcript"})
+
+    with store_file:
+        store = TranscriptStore.load(store_file)
+
+    if store.sentence_start is None or not len(store.sentence_start):
+        return JSONResponse(status_code=404, content={"error": "No sentences"})
+
+    index = int(store.sentence_at(t))
+
+    return {
+        "sentence_index": index,
+        "start": float(store.sentence_start_time[index]),
+        "end": float(store.sentence_end_time[index]),
+        "text": store.text[store.sentence_start[index]:store.sentence_end[index]]
+    }
+
+
+@app.get("/sessions/{session_id}/profile")
+def session_profile(session_id: str):
+    """
+    Profile captured while analysing the session: collapsed stacks
+    (flame graph input) from the sampling profiler, or the cProfile
+    summary when PROFILE_MODE=cprofile.
+    """
+
+    try:
+        profile_file = open_session_file(session_id, COLLAPSED_FILE) or \
+            open_session_file(session_id, SUMMARY_FILE)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if profile_file is None:
+        return JSONResponse(status_code=404, content={"error": "No profile for this session"})
+
+    with profile_file:
+        return PlainTextResponse(profile_file.read().decode("utf-8"))
+
+
+@app.get("/sessions/{session_id}/topics/{n}/cloud.png")
+def topic_cloud(session_id: str, n: int):
+    """
+    Keyword cloud of topic n (1-based, as shown in the UI).
+    Served from the content-addressed cache when already rendered.
+    """
+
+    try:
+        state, result = load_session_result(session_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if result is None:
+        return JSONResponse(status_code=404, content={"error": "Session not found"})
+
+    topics = result.get("topics", [])
+
+    if not 1 <= n <= len(topics):
+        return JSONResponse(status_code=404, content={"error": "Topic not found"})
+
+    weights = topics[n - 1].get("keyword_weights")
+
+    if not weights:
+        return JSONResponse(status_code=404, content={"error": "Topic has no keywords"})
+
+    image_path = render_keyword_cloud(weights)
+
+    return FileResponse(
+        image_path,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+
+@app.post("/maintenance/retention")
+def trigger_retention(background_tasks: BackgroundTasks):
+    """
+    Runs the retention policies in the background.
+    The outcome is available from GET /maintenance/retention.
+    """
+
+    background_tasks.add_task(run_retention_once)
+
+    return JSONResponse(status_code=202, content={"message": "Retention run scheduled"})
+
+
+@app.get("/maintenance/retention")
+def retention_report():
+    """
+    Report of the last retention run: compacted and deleted
+    sessions, bytes reclaimed and the size of dataset/uploads.
+    """
+
+    report = last_retention_report()
+
+    if report is None:
+        return JSONResponse(status_code=404, content={"error": "No retention run yet"})
+
+    return report
+
+
+def parse_resegment_configs(payload):
+    """
+    Turns a /resegment request body into a list of parameter sets.
+    Accepts {"configs": [{...}, ...]}, or min_blocks_per_topic /
+    similarity_drop_percentile given as single values or lists
+    (their cross product is the grid).
+    Raises ValueError for invalid parameters.
+    """
+
+    if "configs" in payload:
+        configs = payload["configs"]
+        if not isinstance(configs, list):
+            raise ValueError("configs must be a list")
+    else:
+        min_blocks = payload.get("min_blocks_per_topic", MIN_BLOCKS_PER_TOPIC)
+        percentiles = payload.get("similarity_drop_percentile", SIMILARITY_DROP_PERCENTILE)
+
+        min_blocks = min_blocks if isinstance(min_blocks, list) else [min_blocks]
+        percentiles = percentiles if isinstance(percentiles, list) else [percentiles]
+
+        configs = [
+            {"min_blocks_per_topic": m, "similarity_drop_percentile": p}
+            for m, p in product(min_blocks, percentiles)
+        ]
+
+    if not configs:
+        raise ValueError("No parameter sets given")
+
+    if len(configs) > MAX_RESEGMENT_CONFIGS:
+        raise ValueError(f"At most {MAX_RESEGMENT_CONFIGS} parameter sets per request")
+
+    parsed = []
+
+    for config in configs:
+        try:
+            min_blocks = int(config.get("min_blocks_per_topic", MIN_BLOCKS_PER_TOPIC))
+            percentile = float(config.get("similarity_drop_percentile", SIMILARITY_DROP_PERCENTILE))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError(f"Invalid parameter set: {config}")
+
+        if min_blocks < 1 or not 0 <= percentile <= 100:
+            raise ValueError(
+                "min_blocks_per_topic must be >= 1 and "
+                "similarity_drop_percentile between 0 and 100"
+            )
+
+        parsed.append({"min_blocks_per_topic": min_blocks, "similarity_drop_percentile": percentile})
+
+    return parsed
+
+
+@app.post("/sessions/{session_id}/resegment")
+def resegment(request: Request, session_id: str, payload: dict = Body(default={})):
+    """
+    Re-segments a finished session with other parameters, reusing
+    its sentences and embeddings instead of re-transcribing.
+    Returns topics and insights for every parameter set.
+    """
+
+    try:
+        configs = parse_resegment_configs(payload)
+        outcome = resegment_session(session_id, configs)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except Exception as e:
+        print("ERROR:", str(e))
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    return negotiated_response(request, {"session_id": session_id, **outcome})
@@ -2,89 +2,525 @@
 
 import os
 import json
+import time
+import numpy as np
+from contextlib import contextmanager
 
 from .audio_convert import convert_to_wav_16k
 from .audio_chunk import trim_and_chunk_audio
-from .transcribe_all import transcribe_audio_folder
-from .clean_transcripts import clean_transcripts
-from .sentence_split import segment_transcripts
-from .topic_segmentation_embeddings import segment_topics_embeddings
-from .summarization import generate_summary
+from .transcribe_all import (
+    transcribe_audio_folder,
+    DRAFT_DECODE_OPTIONS,
+    TRANSCRIPT_STORE_FILE
+)
+from .transcript_store import TranscriptStore
+from .sentence_split import split_sentence_spans, save_sentences
+from .topic_segmentation_embeddings import segment_topics_embeddings, encode_sentences
+from .topic_segmentation_baseline import segment_topics_tfidf
+from .topic_segmentation_hybrid import segment_topics_hybrid
+from .topic_boundaries import adjacent_similarities, split_on_similarity_grid
+from .summarization import generate_summary, summarize_with_embeddings
 from .sentiment_analysis import analyze_sentiment
+from .sentiment_batch import get_sentiment_engine, aggregate_topics
 from .keyword_extraction import extract_keywords
+from .generate_keyword_clouds import render_session_clouds
+from .audio_fingerprint import get_fingerprint_index
+from .asr_service import get_asr_service
+from .sessions import (
+    get_session_folder,
+    load_session_state,
+    write_session_state,
+    save_session_result,
+    open_session_file
+)
 
+# Whisper settings for the two analysis passes
+DRAFT_MODEL = "tiny"
+FINAL_MODEL = "base"
 
-def run_full_pipeline(audio_path, session_id):
+# Chunking and decoding layout. Overlapping chunks are stitched
+# after transcription, so short chunks can be decoded in parallel.
+CHUNK_LENGTH_MS = int(os.environ.get("CHUNK_LENGTH_MS", 120000))
+CHUNK_OVERLAP_MS = int(os.environ.get("CHUNK_OVERLAP_MS", 0))
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", 1))
+
+# Route decoding through the shared cross-session batching service
+ASR_BATCHING = os.environ.get("ASR_BATCHING", "0") == "1"
+
+# Default segmentation parameters (POST /sessions/{id}/resegment tries others)
+MIN_BLOCKS_PER_TOPIC = 8
+SIMILARITY_DROP_PERCENTILE = 10
+
+# Sentence embeddings kept next to segmented/sentences.json for re-segmentation
+SENTENCE_EMBEDDINGS_FILE = "embeddings.npy"
+
+# Topic segmentation engines selectable per request
+SEGMENTERS = {
+    "fast": segment_topics_tfidf,
+    "embeddings": segment_topics_embeddings,
+    "hybrid": segment_topics_hybrid
+}
+
+
+@contextmanager
+def timed(timings, step):
     """
-    Runs complete AI audio analysis pipeline
-    Each upload is isolated using session_id
+    Records the wall time of a pipeline step in seconds.
     """
 
-    # 🔥 Create isolated working directory
-    base_folder = os.path.join("dataset", "uploads", session_id)
-    os.makedirs(base_folder, exist_ok=True)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = round(time.perf_counter() - start, 3)
+
+
+def build_result(topics, version, report):
+    """
+    Result document of one analysis pass.
+    """
+
+    return {
+        "topics": topics,
+        "version": version,
+        "skipped_fraction": report.get("skipped_fraction", 0.0),
+        "timings": report.get("timings", {})
+    }
+
+
+def prepare_audio(audio_path, base_folder, timings=None):
+    """
+    Converts and chunks the uploaded audio.
+    Returns chunks folder.
+    """
+
+    timings = {} if timings is None else timings
 
     print("Step 1: Converting audio")
-    converted_path = convert_to_wav_16k(audio_path, base_folder)
+    with timed(timings, "convert"):
+        converted_path = convert_to_wav_16k(audio_path, base_folder)
 
     print("Step 2: Chunking audio")
-    chunks_folder = trim_and_chunk_audio(converted_path, base_folder)
+    with timed(timings, "chunk"):
+        return trim_and_chunk_audio(
+            converted_path,
+            base_folder,
+            chunk_length_ms=CHUNK_LENGTH_MS,
+            overlap_ms=CHUNK_OVERLAP_MS
+        )
+
+
+def save_embeddings(embeddings, base_folder):
+    """
+    Saves sentence embeddings as segmented/embeddings.npy (float16).
+    Returns the file path.
+    """
+
+    segmented_folder = os.path.join(base_folder, "segmented")
+    os.makedirs(segmented_folder, exist_ok=True)
+
+    path = os.path.join(segmented_folder, SENTENCE_EMBEDDINGS_FILE)
+    np.save(path, np.asarray(embeddings, dtype=np.float16))
+
+    return path
+
+
+def build_topic(store, sentences, embeddings, start, end, topic_sentiment):
+    """
+    Insights of sentence range [start, end): summary, sentiment
+    and keywords. Returns None for ranges too short to describe.
+    """
+
+    topic_text = store.range_text(start, end)
+
+    if not topic_text or len(topic_text.strip()) < 50:
+        return None
+
+    try:
+        if embeddings is not None:
+            # Reuses the segmentation embeddings, no extra model calls
+            summary = summarize_with_embeddings(
+                sentences[start:end],
+                embeddings[start:end],
+                text=topic_text
+            )
+        else:
+            summary = generate_summary(topic_text, sentences=sentences[start:end])
+    except Exception as e:
+        print("Summary error:", e)
+        summary = ""
+
+    if topic_sentiment is None:
+        topic_sentiment = {
+            "label": analyze_sentiment(topic_text),
+            "score": None,
+            "trajectory": []
+        }
+
+    try:
+        keyword_weights = dict(extract_keywords(topic_text, with_scores=True))
+    except Exception as e:
+        print("Keyword error:", e)
+        keyword_weights = {}
+
+    start_time, end_time = store.range_times(start, end)
+
+    return {
+        "start": round(start_time, 2),
+        "end": round(end_time, 2),
+        "summary": summary,
+        "sentiment": topic_sentiment["label"],
+        "sentiment_score": topic_sentiment["score"],
+        "sentiment_trajectory": topic_sentiment["trajectory"],
+        "keywords": list(keyword_weights),
+        "keyword_weights": keyword_weights
+    }
+
+
+def analyze_chunks(
+    chunks_folder,
+    work_folder,
+    model_name=FINAL_MODEL,
+    decode_options=None,
+    segmentation="embeddings",
+    session_id=None,
+    report=None
+):
+    """
+    Transcribes chunks and generates topic insights.
+    Intermediate files are written inside work_folder.
+    report: optional dict, filled with transcription statistics and
+    per-step timings (report["timings"])
+    """
+
+    os.makedirs(work_folder, exist_ok=True)
+
+    report = {} if report is None else report
+    timings = report.setdefault("timings", {})
 
     print("Step 3: Transcribing audio")
-    transcripts_folder = transcribe_audio_folder(chunks_folder, base_folder)
+    with timed(timings, "transcribe"):
+        transcripts_folder = transcribe_audio_folder(
+            chunks_folder,
+            work_folder,
+            model_name=model_name,
+            decode_options=decode_options,
+            workers=TRANSCRIBE_WORKERS,
+            fingerprint_index=get_fingerprint_index(),
+            session_id=session_id,
+            report=report,
+            asr_service=get_asr_service(model_name) if ASR_BATCHING else None
+        )
 
-    print("Step 4: Cleaning transcripts")
-    cleaned_folder = clean_transcripts(transcripts_folder, base_folder)
+    # Language detection and fallback retry time inside transcription
+    timings["decoding"] = report.get("decoding", {})
 
-    print("Step 5: Sentence segmentation")
-    segmented_folder = segment_transcripts(cleaned_folder, base_folder)
+    # The transcript store already holds one whitespace-normalised
+    # buffer, so sentences are split once into offset spans and every
+    # later stage works from those spans and index ranges
+    print("Step 4: Sentence segmentation")
+    with timed(timings, "sentences"):
+        store_file = os.path.join(transcripts_folder, TRANSCRIPT_STORE_FILE)
+        store = TranscriptStore.load(store_file)
+        store.attach_sentences(*split_sentence_spans(store.text))
+        store.save(store_file)
 
-    print("Step 6: Topic segmentation")
-    topics = segment_topics_embeddings(
-        segmented_folder,
-        min_blocks_per_topic=8,
-        similarity_drop_percentile=10
-    )
+        sentences = store.sentences()
+        save_sentences(sentences, work_folder)
+
+    print("Step 5: Topic segmentation")
+    with timed(timings, "segmentation"):
+        segmentation_result = SEGMENTERS[segmentation](
+            sentences,
+            min_blocks_per_topic=MIN_BLOCKS_PER_TOPIC,
+            similarity_drop_percentile=SIMILARITY_DROP_PERCENTILE,
+            return_details=True
+        )
+    ranges = segmentation_result["ranges"]
+    embeddings = segmentation_result["embeddings"]
 
-    print("Step 7: Generating insights")
+    if embeddings is not None and len(embeddings) == len(sentences):
+        save_embeddings(embeddings, work_folder)
+
+    print("Step 6: Generating insights")
+    insights_start = time.perf_counter()
+
+    # All sentences scored in one batch, then aggregated per topic
+    try:
+        sentence_scores = get_sentiment_engine().score_spans(
+            store.text,
+            store.sentence_start,
+            store.sentence_end
+        )
+        topic_sentiments = aggregate_topics(sentence_scores, ranges)
+    except Exception as e:
+        print("Sentiment error:", e)
+        topic_sentiments = [None] * len(ranges)
 
     results = []
 
-    for topic_text in topics:
+    for (start, end), topic_sentiment in zip(ranges, topic_sentiments):
+        topic = build_topic(store, sentences, embeddings, start, end, topic_sentiment)
 
-        if not topic_text or len(topic_text.strip()) < 50:
-            continue
+        if topic is not None:
+            results.append(topic)
 
-        try:
-            summary = generate_summary(topic_text)
-        except Exception as e:
-            print("Summary error:", e)
-            summary = ""
+    timings["insights"] = round(time.perf_counter() - insights_start, 3)
 
-        try:
-            sentiment = analyze_sentiment(topic_text)
-        except Exception as e:
-            print("Sentiment error:", e)
-            sentiment = "Neutral"
+    return results
 
-        try:
-            keywords = extract_keywords(topic_text)
-        except Exception as e:
-            print("Keyword error:", e)
-            keywords = []
 
-        results.append({
-            "summary": summary,
-            "sentiment": sentiment,
-            "keywords": keywords
-        })
+def run_full_pipeline(audio_path, session_id, segmentation="embeddings"):
+    """
+    Runs complete AI audio analysis pipeline
+    Each upload is isolated using session_id
+    """
 
-    # 🔥 Save result per session
-    result_file = os.path.join(base_folder, "result.json")
+    # 🔥 Create isolated working directory
+    base_folder = get_session_folder(session_id)
+    os.makedirs(base_folder, exist_ok=True)
+
+    # Keeps retention away from the session while it runs
+    write_session_state(session_id, status="processing", segmentation=segmentation)
 
-    with open(result_file, "w", encoding="utf-8") as f:
-        json.dump({"topics": results}, f, indent=4, ensure_ascii=False)
+    report = {"timings": {}}
+    chunks_folder = prepare_audio(audio_path, base_folder, report["timings"])
+
+    results = analyze_chunks(
+        chunks_folder,
+        base_folder,
+        segmentation=segmentation,
+        session_id=session_id,
+        report=report
+    )
+
+    # 🔥 Save result per session
+    result = build_result(results, "final", report)
+    save_session_result(session_id, "final", result)
+    write_session_state(
+        session_id,
+        current_version="final",
+        status="completed",
+        segmentation=segmentation
+    )
 
     print("Pipeline completed successfully")
 
-    return {"topics": results}
\ No newline at end of file
+    return result
+
+
+def run_preview_pipeline(audio_path, session_id, segmentation="embeddings"):
+    """
+    Fast first pass: tiny Whisper model with greedy decoding.
+    Returns a draft result; refine_session() replaces it later.
+    """
+
+    base_folder = get_session_folder(session_id)
+    os.makedirs(base_folder, exist_ok=True)
+
+    # Keeps retention away from the session while it runs
+    write_session_state(session_id, status="processing", segmentation=segmentation)
+
+    report = {"timings": {}}
+    chunks_folder = prepare_audio(audio_path, base_folder, report["timings"])
+
+    # Draft intermediates live in their own folder so the
+    # refinement pass never reads half-written draft files
+    results = analyze_chunks(
+        chunks_folder,
+        os.path.join(base_folder, "draft"),
+        model_name=DRAFT_MODEL,
+        decode_options=DRAFT_DECODE_OPTIONS,
+        segmentation=segmentation,
+        session_id=session_id,
+        report=report
+    )
+
+    result = build_result(results, "draft", report)
+    save_session_result(session_id, "draft", result)
+    write_session_state(
+        session_id,
+        current_version="draft",
+        status="refining",
+        segmentation=segmentation
+    )
+
+    print("Draft pass completed")
+
+    return result
+
+
+def refine_session(session_id):
+    """
+    Background refinement pass with the full model.
+    Replaces the draft transcript and topics of a preview session.
+    """
+
+    base_folder = get_session_folder(session_id)
+    chunks_folder = os.path.join(base_folder, "chunks")
+    segmentation = (load_session_state(session_id) or {}).get("segmentation", "embeddings")
+
+    report = {}
+
+    try:
+        results = analyze_chunks(
+            chunks_folder,
+            base_folder,
+            segmentation=segmentation,
+            session_id=session_id,
+            report=report
+        )
+    except Exception as e:
+        print("Refinement error:", e)
+        write_session_state(session_id, status="refine_failed", error=str(e))
+        return None
+
+    state = load_session_state(session_id) or {}
+
+    if state.get("current_version") == "final":
+        return None
+
+    result = build_result(results, "final", report)
+    save_session_result(session_id, "final", result)
+    write_session_state(session_id, current_version="final", status="completed")
+
+    print("Refinement pass completed")
+
+    # The final topics replace the draft ones, whose clouds were pre-rendered
+    try:
+        render_session_clouds(result["topics"])
+    except Exception as e:
+        print("Cloud pre-render error:", e)
+
+    return result
+
+
+def load_segmentation_inputs(session_id):
+    """
+    Loads what re-segmentation needs from a finished session:
+    the transcript store, sentences and sentence embeddings.
+    Embeddings are computed (and saved) once if the session's
+    segmenter did not produce them.
+    Raises FileNotFoundError if the session has no transcript.
+    """
+
+    state = load_session_state(session_id)
+
+    if state is None:
+        raise FileNotFoundError("Session not found")
+
+    # Draft sessions keep their intermediates under draft/
+    prefix = "draft" if state.get("current_version") == "draft" else ""
+
+    store_file = open_session_file(
+        session_id,
+        os.path.join(prefix, "transcripts", TRANSCRIPT_STORE_FILE)
+    )
+
+    if store_file is None:
+        raise FileNotFoundError("No timestamped transcript")
+
+    with store_file:
+        store = TranscriptStore.load(store_file)
+
+    if store.sentence_start is None:
+        raise FileNotFoundError("No sentences")
+
+    sentences = None
+    sentences_file = open_session_file(session_id, os.path.join(prefix, "segmented", "sentences.json"))
+
+    if sentences_file is not None:
+        with sentences_file:
+            sentences = json.load(sentences_file)
+
+    if sentences is None or len(sentences) != len(store.sentence_start):
+        sentences = store.sentences()
+
+    embeddings = None
+    embeddings_file = open_session_file(
+        session_id,
+        os.path.join(prefix, "segmented", SENTENCE_EMBEDDINGS_FILE)
+    )
+
+    if embeddings_file is not None:
+        with embeddings_file:
+            embeddings = np.load(embeddings_file).astype(np.float32)
+
+    if embeddings is None or len(embeddings) != len(sentences):
+        embeddings = encode_sentences(sentences)
+
+        work_folder = os.path.join(get_session_folder(session_id), prefix)
+        if os.path.isdir(os.path.join(work_folder, "segmented")):
+            save_embeddings(embeddings, work_folder)
+
+    return store, sentences, embeddings
+
+
+def resegment_session(session_id, configs):
+    """
+    Re-runs topic segmentation of a finished session for each
+    parameter set in configs ({"min_blocks_per_topic",
+    "similarity_drop_percentile"}), reusing the stored sentences and
+    embeddings: no audio is decoded again.
+
+    All configurations are segmented together from one similarity
+    array, and insights are built once per distinct sentence range.
+    The stored result is not modified.
+    """
+
+    timings = {}
+
+    with timed(timings, "load"):
+        store, sentences, embeddings = load_segmentation_inputs(session_id)
+
+    with timed(timings, "segmentation"):
+        if len(sentences) < 3:
+            grid = [[(i, i + 1) for i in range(len(sentences))] for _ in configs]
+        else:
+            similarities = adjacent_similarities(embeddings)
+            thresholds = np.percentile(
+                similarities,
+                [config["similarity_drop_percentile"] for config in configs]
+            )
+            grid = split_on_similarity_grid(
+                similarities,
+                thresholds,
+                [config["min_blocks_per_topic"] for config in configs]
+            )
+
+    insights_start = time.perf_counter()
+
+    # Configurations often share ranges; each is described once
+    distinct_ranges = sorted({r for ranges in grid for r in ranges})
+
+    try:
+        sentence_scores = get_sentiment_engine().score_spans(
+            store.text,
+            store.sentence_start,
+            store.sentence_end
+        )
+        topic_sentiments = aggregate_topics(sentence_scores, distinct_ranges)
+    except Exception as e:
+        print("Sentiment error:", e)
+        topic_sentiments = [None] * len(distinct_ranges)
+
+    topics_by_range = {
+        (start, end): build_topic(store, sentences, embeddings, start, end, topic_sentiment)
+        for (start, end), topic_sentiment in zip(distinct_ranges, topic_sentiments)
+    }
+
+    results = []
+
+    for config, ranges in zip(configs, grid):
+        topics = [topics_by_range[r] for r in ranges if topics_by_range[r] is not None]
+
+        results.append({
+            "min_blocks_per_topic": config["min_blocks_per_topic"],
+            "similarity_drop_percentile": config["similarity_drop_percentile"],
+            "num_topics": len(topics),
+            "topics": topics
+        })
+
+    timings["insights"] = round(time.perf_counter() - insights_start, 3)
+
+    return {"results": results, "timings": timings}
@@ -0,0 +1,125 @@
+# backend/profiling.py
+
+import io
+import os
+import sys
+import random
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager, nullcontext
+from collections import Counter
+
+# Fraction of /analyze/ requests profiled without profile=true (0 = only on request)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+# "sampling" (stack samples every PROFILE_INTERVAL_MS) or "cprofile" (deterministic)
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampling")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Written to the session folder
+COLLAPSED_FILE = "profile.collapsed"
+PSTATS_FILE = "profile.pstats"
+SUMMARY_FILE = "profile.txt"
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every interval from a
+    background thread (sys._current_frames) and counts identical
+    stacks, ready for flame graph tools in collapsed format:
+        root;caller;callee <count>
+    The profiled thread is never instrumented, so overhead is the
+    sampler's own wakeups.
+    """
+
+    def __init__(self, thread_id=None, interval_ms=PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def should_profile(requested):
+    """
+    Profile when the client asked for it, or for a random
+    PROFILE_SAMPLE_RATE share of requests.
+    """
+
+    return requested or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+@contextmanager
+def _profile_to_folder(folder, mode):
+    os.makedirs(folder, exist_ok=True)
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(folder, PSTATS_FILE))
+
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(60)
+
+            with open(os.path.join(folder, SUMMARY_FILE), "w", encoding="utf-8") as f:
+                f.write(summary.getvalue())
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+
+        with open(os.path.join(folder, COLLAPSED_FILE), "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
+
+
+def profile_session(folder, enabled, mode=PROFILE_MODE):
+    """
+    Context manager profiling the current thread into folder.
+    A no-op when disabled.
+    """
+
+    if not enabled:
+        return nullcontext()
+
+    return _profile_to_folder(folder, mode)
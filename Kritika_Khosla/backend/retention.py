@@ -0,0 +1,397 @@
+# backend/retention.py
+
+import os
+import time
+import shutil
+import tarfile
+import threading
+import subprocess
+from datetime import datetime
+
+from .sessions import (
+    BASE_UPLOAD_DIR,
+    SESSION_STATE_FILE,
+    ARCHIVE_ZSTD,
+    ARCHIVE_XZ,
+    zstandard,
+    get_session_folder,
+    load_session_state,
+    write_session_state
+)
+from .audio_fingerprint import get_fingerprint_index
+from .profiling import COLLAPSED_FILE, PSTATS_FILE, SUMMARY_FILE
+
+# Finished sessions older than this are compacted into one archive
+COMPACT_AFTER_HOURS = float(os.getenv("RETENTION_COMPACT_AFTER_HOURS", "24"))
+
+# Sessions older than this are deleted (0 keeps them forever)
+DELETE_AFTER_DAYS = float(os.getenv("RETENTION_DELETE_AFTER_DAYS", "0"))
+
+# Disk budget for dataset/uploads; oldest sessions go first (0 = no budget)
+MAX_TOTAL_BYTES = int(os.getenv("RETENTION_MAX_BYTES", "0"))
+
+# Processing / refining states not updated for this long are left over
+# from a server that died mid-run, and are treated as failed
+STALE_AFTER_HOURS = float(os.getenv("RETENTION_STALE_AFTER_HOURS", "6"))
+
+# How often the server runs the policies
+INTERVAL_MINUTES = float(os.getenv("RETENTION_INTERVAL_MINUTES", "60"))
+
+# Only sessions in these states are safe to compact
+FINISHED_STATUSES = ("completed", "refine_failed")
+
+# Sessions a pipeline is still writing to; never touched
+ACTIVE_STATUSES = ("processing", "refining")
+
+# What a compacted session keeps, relative to the session folder.
+# Everything else (upload, converted.wav, chunk WAVs, draft pass,
+# cleaned text) is an intermediate and is deleted.
+# Only small text and npz files go into the archive, which is read on
+# every request for the session; the FLAC audio stays a separate file.
+KEPT_FILES = ("converted.flac",)
+ARCHIVED_FILES = (
+    "result.json",
+    os.path.join("chunks", "chunks.json"),
+    COLLAPSED_FILE,
+    PSTATS_FILE,
+    SUMMARY_FILE
+)
+ARCHIVED_FOLDERS = ("transcripts", "segmented")
+
+ZSTD_LEVEL = 10
+
+
+def folder_size(folder):
+    total = 0
+
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+
+    return total
+
+
+def session_age_seconds(session_id, now=None):
+    """
+    Seconds since the session was created, from the timestamp its id
+    starts with (compaction rewrites files, so mtimes are not used).
+    Falls back to the folder mtime for ids without a timestamp.
+    """
+
+    try:
+        created = datetime.strptime(session_id[:15], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        created = os.path.getmtime(get_session_folder(session_id))
+
+    return (now or time.time()) - created
+
+
+def list_sessions():
+    if not os.path.isdir(BASE_UPLOAD_DIR):
+        return []
+
+    return sorted(
+        name for name in os.listdir(BASE_UPLOAD_DIR)
+        if os.path.isdir(os.path.join(BASE_UPLOAD_DIR, name))
+    )
+
+
+def encode_flac(wav_path, flac_path):
+    """
+    Lossless re-encode of the converted audio (about half the size).
+    """
+
+    command = [
+        "ffmpeg",
+        "-y",
+        "-loglevel", "error",
+        "-i", wav_path,
+        "-c:a", "flac",
+        flac_path
+    ]
+
+    subprocess.run(command, check=True)
+
+    return flac_path
+
+
+def is_finished(session_id, state):
+    """
+    A session is finished when its state says so, or, for sessions
+    created before session.json existed, when it has a result.json.
+    """
+
+    if state.get("status"):
+        return state["status"] in FINISHED_STATUSES
+
+    return os.path.isfile(os.path.join(get_session_folder(session_id), "result.json"))
+
+
+def expire_stale_state(session_id, state, stale_after_hours=STALE_AFTER_HOURS, now=None):
+    """
+    Marks an active state that stopped updating more than
+    stale_after_hours ago as failed: "refining" becomes "refine_failed"
+    (the draft result stays valid), "processing" becomes "failed".
+    Returns the (possibly updated) state.
+    """
+
+    if state.get("status") not in ACTIVE_STATUSES or not stale_after_hours:
+        return state
+
+    try:
+        updated = datetime.fromisoformat(state["updated_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        updated = os.path.getmtime(os.path.join(get_session_folder(session_id), SESSION_STATE_FILE))
+
+    if (now or time.time()) - updated <= stale_after_hours * 3600:
+        return state
+
+    status = "refine_failed" if state["status"] == "refining" else "failed"
+
+    return write_session_state(
+        session_id,
+        status=status,
+        error=f"No progress for over {stale_after_hours:g} hours; the run was interrupted"
+    )
+
+
+def _archive_members(session_folder, state):
+    """
+    Relative paths of every file that goes into the archive.
+    """
+
+    members = [
+        name for name in ARCHIVED_FILES
+        if os.path.isfile(os.path.join(session_folder, name))
+    ]
+
+    # A session still on its draft needs the draft artifacts instead
+    if state.get("current_version") == "draft":
+        members.append("result_draft.json")
+        folders = [os.path.join("draft", name) for name in ARCHIVED_FOLDERS]
+    else:
+        folders = ARCHIVED_FOLDERS
+
+    for folder in folders:
+        for root, _, files in os.walk(os.path.join(session_folder, folder)):
+            for name in sorted(files):
+                members.append(os.path.relpath(os.path.join(root, name), session_folder))
+
+    return members
+
+
+def _write_archive(session_folder, members):
+    """
+    Writes all members into one tar, zstd-compressed when the
+    zstandard package is installed and xz-compressed otherwise.
+    Returns the archive file name.
+    """
+
+    archive_name = ARCHIVE_ZSTD if zstandard is not None else ARCHIVE_XZ
+    archive_path = os.path.join(session_folder, archive_name)
+    tmp_path = archive_path + ".tmp"
+
+    if zstandard is not None:
+        with open(tmp_path, "wb") as raw:
+            with zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw) as writer:
+                with tarfile.open(fileobj=writer, mode="w|") as tar:
+                    for member in members:
+                        tar.add(os.path.join(session_folder, member), arcname=member.replace(os.sep, "/"))
+    else:
+        with tarfile.open(tmp_path, mode="w:xz") as tar:
+            for member in members:
+                tar.add(os.path.join(session_folder, member), arcname=member.replace(os.sep, "/"))
+
+    os.replace(tmp_path, archive_path)
+
+    return archive_name
+
+
+def compact_session(session_id):
+    """
+    Replaces a finished session's files by session.json, the FLAC
+    audio and one compressed archive holding transcripts and results.
+    Results stay readable through sessions.open_session_file().
+    Returns the number of bytes reclaimed.
+    """
+
+    session_folder = get_session_folder(session_id)
+    state = load_session_state(session_id) or {}
+
+    if state.get("compacted") or not is_finished(session_id, state):
+        return 0
+
+    size_before = folder_size(session_folder)
+
+    wav_path = os.path.join(session_folder, "converted.wav")
+    if os.path.exists(wav_path):
+        encode_flac(wav_path, os.path.join(session_folder, "converted.flac"))
+
+    members = _archive_members(session_folder, state)
+    archive_name = _write_archive(session_folder, members)
+
+    # Recorded before deleting anything, so an interrupted run
+    # leaves a readable session. Legacy sessions get the state
+    # that lets load_session_result() find their archived result.
+    fields = {"compacted": True, "archive": archive_name}
+    if not state.get("status"):
+        fields.update(current_version="final", status="completed")
+
+    write_session_state(session_id, **fields)
+
+    keep = {SESSION_STATE_FILE, archive_name, *KEPT_FILES}
+
+    for name in os.listdir(session_folder):
+        if name in keep:
+            continue
+
+        path = os.path.join(session_folder, name)
+
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+    return size_before - folder_size(session_folder)
+
+
+def delete_session(session_id):
+    """
+    Removes a session folder, and its entries in the fingerprint
+    index so neither duplicate uploads nor chunk reuse point at it.
+    The index is saved by the caller.
+    Returns the number of bytes reclaimed.
+    """
+
+    session_folder = get_session_folder(session_id)
+    size = folder_size(session_folder)
+
+    shutil.rmtree(session_folder, ignore_errors=True)
+
+    get_fingerprint_index().remove_session(session_id)
+
+    return size
+
+
+def run_retention(
+    compact_after_hours=COMPACT_AFTER_HOURS,
+    delete_after_days=DELETE_AFTER_DAYS,
+    max_total_bytes=MAX_TOTAL_BYTES,
+    stale_after_hours=STALE_AFTER_HOURS
+):
+    """
+    Applies the retention policies to dataset/uploads:
+      1. deletes sessions older than delete_after_days
+      2. compacts finished sessions older than compact_after_hours,
+         and deletes unfinished ones that old (failed uploads)
+      3. deletes the oldest sessions until the folder fits max_total_bytes
+    Sessions still being processed or refined are skipped, unless
+    their state has not been updated for stale_after_hours.
+    Returns a report with what was done and the bytes reclaimed.
+    """
+
+    now = time.time()
+    report = {"compacted": [], "deleted": [], "failed": {}, "reclaimed_bytes": 0}
+
+    ages = {}
+    active = set()
+
+    for session_id in list_sessions():
+        try:
+            ages[session_id] = session_age_seconds(session_id, now)
+        except (OSError, ValueError):
+            continue
+
+    for session_id, age in ages.items():
+        try:
+            state = expire_stale_state(
+                session_id,
+                load_session_state(session_id) or {},
+                stale_after_hours,
+                now
+            )
+
+            if state.get("status") in ACTIVE_STATUSES:
+                active.add(session_id)
+                continue
+
+            if delete_after_days and age > delete_after_days * 86400:
+                report["reclaimed_bytes"] += delete_session(session_id)
+                report["deleted"].append(session_id)
+                continue
+
+            if age <= compact_after_hours * 3600:
+                continue
+
+            if is_finished(session_id, state):
+                if not state.get("compacted"):
+                    report["reclaimed_bytes"] += compact_session(session_id)
+                    report["compacted"].append(session_id)
+            else:
+                # Failed runs and uploads that never produced a result
+                report["reclaimed_bytes"] += delete_session(session_id)
+                report["deleted"].append(session_id)
+
+        except Exception as e:
+            print("Retention error:", session_id, e)
+            report["failed"][session_id] = str(e)
+
+    remaining = [s for s in ages if s not in report["deleted"]]
+
+    # Running sessions count towards the budget but are never deleted
+    deletable = [s for s in remaining if s not in active]
+    sizes = {s: folder_size(get_session_folder(s)) for s in remaining}
+    total = sum(sizes.values())
+
+    if max_total_bytes:
+        # Oldest first
+        for session_id in sorted(deletable, key=lambda s: -ages[s]):
+            if total <= max_total_bytes:
+                break
+
+            reclaimed = delete_session(session_id)
+            report["reclaimed_bytes"] += reclaimed
+            report["deleted"].append(session_id)
+            total -= sizes[session_id]
+
+    if report["deleted"]:
+        get_fingerprint_index().save()
+
+    report["total_bytes"] = total
+    report["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    return report
+
+
+_last_report = None
+_run_lock = threading.Lock()
+
+
+def run_retention_once():
+    """
+    Runs the policies unless a run is already in progress.
+    Returns the report, or None if skipped.
+    """
+
+    global _last_report
+
+    if not _run_lock.acquire(blocking=False):
+        return None
+
+    try:
+        _last_report = run_retention()
+        print(
+            "Retention: compacted", len(_last_report["compacted"]),
+            "deleted", len(_last_report["deleted"]),
+            "reclaimed", _last_report["reclaimed_bytes"], "bytes"
+        )
+        return _last_report
+    finally:
+        _run_lock.release()
+
+
+def last_retention_report():
+    return _last_report
@@ -2,38 +2,59 @@
 
 import os
 import json
+import numpy as np
 import nltk
-from nltk.tokenize import sent_tokenize
 
 nltk.download("punkt")
 
+_punkt = None
 
-def segment_transcripts(cleaned_folder, base_folder):
+
+def get_punkt_tokenizer():
     """
-    Reads cleaned transcripts and splits into sentences.
-    Returns list of sentences.
+    Returns the English Punkt model behind sent_tokenize.
     """
 
-    segmented_folder = os.path.join(base_folder, "segmented")
-    os.makedirs(segmented_folder, exist_ok=True)
+    global _punkt
+
+    if _punkt is None:
+        try:
+            # NLTK >= 3.8.2 ships the model as punkt_tab
+            from nltk.tokenize import PunktTokenizer
+            nltk.download("punkt_tab")
+            _punkt = PunktTokenizer("english")
+        except ImportError:
+            _punkt = nltk.data.load("tokenizers/punkt/english.pickle")
+
+    return _punkt
+
+
+def split_sentence_spans(text):
+    """
+    Splits one text buffer into sentences without copying it.
+    Returns (start, end) character offset arrays.
+    """
+
+    spans = np.array(list(get_punkt_tokenizer().span_tokenize(text)), dtype=np.int64)
 
-    all_sentences = []
+    if not len(spans):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
 
-    for file in os.listdir(cleaned_folder):
-        if file.endswith(".txt"):
-            file_path = os.path.join(cleaned_folder, file)
+    return spans[:, 0], spans[:, 1]
 
-            with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
 
-            sentences = sent_tokenize(text)
-            all_sentences.extend(sentences)
+def save_sentences(sentences, base_folder):
+    """
+    Saves the sentence list as segmented/sentences.json.
+    Returns segmented folder.
+    """
+
+    segmented_folder = os.path.join(base_folder, "segmented")
+    os.makedirs(segmented_folder, exist_ok=True)
 
     output_file = os.path.join(segmented_folder, "sentences.json")
 
     with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(all_sentences, f, indent=4, ensure_ascii=False)
-
-    print("Sentence segmentation completed")
+        json.dump(sentences, f, indent=4, ensure_ascii=False)
 
-    return all_sentences
\ No newline at end of file
+    return segmented_folder
@@ -0,0 +1,262 @@
+# backend/sentiment_batch.py
+
+import re
+import threading
+import numpy as np
+import nltk
+from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+
+nltk.download("vader_lexicon")
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Same tokens matched on original-case text, so offsets stay valid
+SPAN_TOKEN_PATTERN = re.compile(TOKEN_PATTERN.pattern, re.IGNORECASE)
+
+# VADER normalisation constant for the compound score
+ALPHA = 15.0
+
+# How many preceding tokens a negation reaches, as in VADER
+NEGATION_WINDOW = 3
+
+
+class LexiconSentimentEngine:
+    """
+    Batch sentiment scoring over the VADER lexicon.
+
+    The lexicon is compiled once into a token -> id mapping with
+    parallel arrays of valence, booster weight and negator flag.
+    All sentences of a session are tokenized in one pass and scored
+    with array operations instead of one analyzer call per text.
+    """
+
+    def __init__(self):
+        lexicon = SentimentIntensityAnalyzer().lexicon
+        constants = VaderConstants()
+
+        words = set(lexicon) | set(constants.BOOSTER_DICT) | set(constants.NEGATE)
+
+        # Id 0 is reserved for out-of-vocabulary tokens
+        self.vocab = {word: i for i, word in enumerate(sorted(words), start=1)}
+        size = len(self.vocab) + 1
+
+        self.valence = np.zeros(size, dtype=np.float32)
+        self.booster = np.zeros(size, dtype=np.float32)
+        self.negator = np.zeros(size, dtype=bool)
+
+        for word, token_id in self.vocab.items():
+            self.valence[token_id] = lexicon.get(word, 0.0)
+            self.booster[token_id] = constants.BOOSTER_DICT.get(word, 0.0)
+            self.negator[token_id] = word in constants.NEGATE
+
+        self.negation_scalar = constants.N_SCALAR
+
+    def tokenize(self, sentences):
+        """
+        Returns (token ids, sentence index of each token).
+        """
+
+        token_ids = []
+        sentence_ids = []
+        lookup = self.vocab.get
+
+        for i, sentence in enumerate(sentences):
+            tokens = TOKEN_PATTERN.findall(sentence.lower())
+            token_ids.extend(lookup(token, 0) for token in tokens)
+            sentence_ids.extend([i] * len(tokens))
+
+        return (
+            np.array(token_ids, dtype=np.int32),
+            np.array(sentence_ids, dtype=np.int32)
+        )
+
+    def tokenize_spans(self, text, sentence_start, sentence_end):
+        """
+        Tokenizes a whole text buffer once and assigns each token to
+        the sentence span it falls in.
+        Returns (token ids, sentence index of each token).
+        """
+
+        if not len(sentence_start):
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+        lookup = self.vocab.get
+        token_ids = []
+        positions = []
+
+        for match in SPAN_TOKEN_PATTERN.finditer(text):
+            token_ids.append(lookup(match.group().lower(), 0))
+            positions.append(match.start())
+
+        positions = np.array(positions, dtype=np.int64)
+        sentence_ids = np.searchsorted(sentence_start, positions, side="right") - 1
+
+        # Drop tokens outside every span (e.g. text between sentences)
+        inside = (sentence_ids >= 0) & (positions < np.asarray(sentence_end)[np.maximum(sentence_ids, 0)])
+
+        return (
+            np.array(token_ids, dtype=np.int32)[inside],
+            sentence_ids[inside].astype(np.int32)
+        )
+
+    def score_sentences(self, sentences):
+        """
+        Compound score in [-1, 1] for every sentence.
+        """
+
+        token_ids, sentence_ids = self.tokenize(sentences)
+
+        return self.score_tokens(token_ids, sentence_ids, len(sentences))
+
+    def score_spans(self, text, sentence_start, sentence_end):
+        """
+        Compound score for every sentence span of a text buffer.
+        """
+
+        token_ids, sentence_ids = self.tokenize_spans(text, sentence_start, sentence_end)
+
+        return self.score_tokens(token_ids, sentence_ids, len(sentence_start))
+
+    def score_tokens(self, token_ids, sentence_ids, num_sentences):
+        """
+        Vectorized VADER scoring of a flat token stream.
+        """
+
+        if not len(token_ids):
+            return np.zeros(num_sentences, dtype=np.float32)
+
+        valence = self.valence[token_ids].copy()
+        sign = np.sign(valence)
+
+        for offset in range(1, NEGATION_WINDOW + 1):
+            # Only look back within the same sentence
+            same_sentence = np.zeros(len(token_ids), dtype=bool)
+            same_sentence[offset:] = sentence_ids[offset:] == sentence_ids[:-offset]
+
+            previous = np.zeros(len(token_ids), dtype=np.int32)
+            previous[offset:] = token_ids[:-offset]
+
+            if offset == 1:
+                # Intensifier directly before a sentiment word
+                valence += sign * self.booster[previous] * same_sentence
+
+            negated = same_sentence & self.negator[previous]
+            valence = np.where(negated, valence * self.negation_scalar, valence)
+
+        totals = np.bincount(sentence_ids, weights=valence, minlength=num_sentences)
+
+        return (totals / np.sqrt(totals * totals + ALPHA)).astype(np.float32)
+
+    def score_topics(self, sentences, ranges, **kwargs):
+        """
+        Scores all sentences once and aggregates them per topic range.
+        Returns (sentence scores, topic aggregates).
+        """
+
+        scores = self.score_sentences(sentences)
+
+        return scores, aggregate_topics(scores, ranges, **kwargs)
+
+
+def aggregate_topics(
+    scores,
+    ranges,
+    positive_threshold=0.05,
+    negative_threshold=-0.05,
+    trajectory_points=20
+):
+    """
+    Per-topic aggregates of sentence scores.
+    ranges are (start, end) sentence index ranges in any order.
+    Each topic gets a label, mean score, min/max and a smoothed
+    trajectory of at most trajectory_points values.
+    """
+
+    topics = []
+
+    if not ranges:
+        return topics
+
+    # Prefix sums, so ranges may overlap or share a start
+    # (parameter sweeps describe ranges from several segmentations)
+    cumulative = np.concatenate(([0.0], np.cumsum(scores, dtype=np.float64)))
+    starts = np.array([start for start, _ in ranges])
+    ends = np.array([end for _, end in ranges])
+    means = (cumulative[ends] - cumulative[starts]) / np.maximum(ends - starts, 1)
+
+    for (start, end), mean in zip(ranges, means):
+        topic_scores = scores[start:end]
+
+        if mean > positive_threshold:
+            label = "Positive"
+        elif mean < negative_threshold:
+            label = "Negative"
+        else:
+            label = "Neutral"
+
+        topics.append({
+            "label": label,
+            "score": round(float(mean), 3),
+            "min": round(float(topic_scores.min()), 3),
+            "max": round(float(topic_scores.max()), 3),
+            "trajectory": smooth_trajectory(topic_scores, trajectory_points)
+        })
+
+    return topics
+
+
+def smooth_trajectory(scores, points=20):
+    """
+    Averages scores into at most `points` equal-width bins.
+    """
+
+    if not len(scores):
+        return []
+
+    bins = np.array_split(scores, min(points, len(scores)))
+
+    return [round(float(b.mean()), 3) for b in bins]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_sentiment_engine():
+    """
+    Returns the shared engine, compiling the lexicon on first use.
+    """
+
+    global _engine
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = LexiconSentimentEngine()
+
+    return _engine
+
+
+# Optional: throughput comparison against TextBlob
+if __name__ == "__main__":
+    import sys
+    import json
+    import time
+    from textblob import TextBlob
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        sentences = json.load(f)
+
+    engine = get_sentiment_engine()
+
+    start = time.perf_counter()
+    engine.score_sentences(sentences)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for sentence in sentences:
+        TextBlob(sentence).sentiment.polarity
+    textblob_seconds = time.perf_counter() - start
+
+    print(f"Sentences: {len(sentences)}")
+    print(f"Lexicon engine: {len(sentences) / batch_seconds:.0f} sentences/s")
+    print(f"TextBlob:       {len(sentences) / textblob_seconds:.0f} sentences/s")
@@ -0,0 +1,277 @@
+# backend/serialization.py
+
+import os
+import json
+import gzip
+
+try:
+    import orjson
+except ImportError:   # stdlib json fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+
+# Payloads smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _default(value):
+    # NumPy scalars and arrays that slip into results
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(obj):
+    """
+    Compact JSON as UTF-8 bytes, through orjson when installed.
+    """
+
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    return json.dumps(
+        obj,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def dumps_msgpack(obj):
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def loads_msgpack(data):
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+
+    return msgpack.unpackb(data, raw=False)
+
+
+# Media type -> encoder, in server preference order
+CODECS = {JSON_TYPE: dumps_json}
+if msgpack is not None:
+    CODECS[MSGPACK_TYPE] = dumps_msgpack
+
+
+def _parse_header(header):
+    """
+    Parses an Accept / Accept-Encoding header into {value: q}.
+    """
+
+    accepted = {}
+
+    for part in (header or "").split(","):
+        value, _, params = part.strip().partition(";")
+        value = value.strip().lower()
+
+        if not value:
+            continue
+
+        q = 1.0
+        for param in params.split(";"):
+            key, _, number = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+
+        accepted[value] = q
+
+    return accepted
+
+
+def negotiate_media_type(accept):
+    """
+    Picks the response format from the Accept header.
+    JSON unless the client prefers MessagePack.
+    """
+
+    accepted = _parse_header(accept)
+
+    if msgpack is not None:
+        for media_type in (MSGPACK_TYPE, "application/x-msgpack"):
+            if accepted.get(media_type, 0) > accepted.get(JSON_TYPE, 0):
+                return MSGPACK_TYPE
+
+    return JSON_TYPE
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks zstd, gzip or no compression from Accept-Encoding.
+    """
+
+    accepted = _parse_header(accept_encoding)
+
+    if zstandard is not None and accepted.get("zstd", 0) > 0:
+        return "zstd"
+
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    return data
+
+
+def encode_payload(obj, accept=None, accept_encoding=None):
+    """
+    Serializes obj the way the client asked for.
+    Returns (body, headers).
+    """
+
+    media_type = negotiate_media_type(accept)
+    body = CODECS[media_type](obj)
+
+    headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return body, headers
+
+
+def write_json_file(path, obj):
+    """
+    Writes compact JSON through a temp file.
+    """
+
+    tmp_path = path + ".tmp"
+
+    with open(tmp_path, "wb") as f:
+        f.write(dumps_json(obj))
+
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def read_json_file(path_or_file):
+    if hasattr(path_or_file, "read"):
+        return loads_json(path_or_file.read())
+
+    with open(path_or_file, "rb") as f:
+        return loads_json(f.read())
+
+
+# ---------------- Streaming exports ----------------
+
+def write_jsonl(records, path):
+    """
+    Writes records one JSON object per line, as they are produced.
+    Returns the number of records written.
+    """
+
+    count = 0
+
+    with open(path, "wb") as f:
+        for record in records:
+            f.write(dumps_json(record))
+            f.write(b"\n")
+            count += 1
+
+    return count
+
+
+def iter_jsonl(path):
+    """
+    Reads a JSONL file lazily, one record at a time.
+    """
+
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield loads_json(line)
+
+
+def write_parquet(records, path, batch_size=10000):
+    """
+    Writes records to Parquet in row groups of batch_size,
+    so only one batch is held in memory.
+    Returns the number of records written.
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    batch = []
+    count = 0
+
+    def flush():
+        nonlocal writer
+        # Later batches must match the schema of the first one
+        table = pa.Table.from_pylist(batch, schema=writer.schema if writer else None)
+
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+        writer.write_table(table)
+        batch.clear()
+
+    try:
+        for record in records:
+            batch.append(record)
+            count += 1
+
+            if len(batch) >= batch_size:
+                flush()
+
+        if batch:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return count
+
+
+def iter_parquet(path, columns=None, batch_size=10000):
+    """
+    Reads a Parquet file lazily, one row group batch at a time.
+    columns limits which fields are decoded.
+    """
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
@@ -0,0 +1,162 @@
+# backend/sessions.py
+
+import io
+import os
+import re
+import json
+import tarfile
+from datetime import datetime
+
+from .serialization import write_json_file, read_json_file
+
+try:
+    import zstandard
+except ImportError:   # archives fall back to xz
+    zstandard = None
+
+BASE_UPLOAD_DIR = os.path.join("dataset", "uploads")
+
+SESSION_STATE_FILE = "session.json"
+
+# Result file written by each analysis pass
+RESULT_FILES = {
+    "draft": "result_draft.json",
+    "final": "result.json"
+}
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Compacted sessions keep everything but session.json in one archive
+ARCHIVE_ZSTD = "archive.tar.zst"
+ARCHIVE_XZ = "archive.tar.xz"
+
+
+def get_session_folder(session_id):
+    """
+    Returns the working folder of a session.
+    Raises ValueError for ids that could escape the uploads folder.
+    """
+
+    if not session_id or not SESSION_ID_PATTERN.match(session_id):
+        raise ValueError(f"Invalid session id: {session_id}")
+
+    return os.path.join(BASE_UPLOAD_DIR, session_id)
+
+
+def load_session_state(session_id):
+    """
+    Reads session.json of a session.
+    Returns None if the session has no recorded state.
+    """
+
+    state_file = os.path.join(get_session_folder(session_id), SESSION_STATE_FILE)
+
+    if not os.path.exists(state_file):
+        return None
+
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_session_state(session_id, **fields):
+    """
+    Updates session.json with the given fields.
+    Written through a temp file so readers never see a partial file.
+    """
+
+    session_folder = get_session_folder(session_id)
+    os.makedirs(session_folder, exist_ok=True)
+
+    state = load_session_state(session_id) or {"session_id": session_id}
+    state.update(fields)
+    state["updated_at"] = datetime.now().isoformat(timespec="seconds")
+
+    state_file = os.path.join(session_folder, SESSION_STATE_FILE)
+    tmp_file = state_file + ".tmp"
+
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4, ensure_ascii=False)
+
+    os.replace(tmp_file, state_file)
+
+    return state
+
+
+def save_session_result(session_id, version, result):
+    """
+    Saves the result of one analysis pass (draft or final).
+    Returns the result file path.
+    """
+
+    result_file = os.path.join(get_session_folder(session_id), RESULT_FILES[version])
+
+    # Compact: results are read by the API, not by people
+    return write_json_file(result_file, result)
+
+
+def load_session_result(session_id):
+    """
+    Loads the current result of a session.
+    Returns (state, result), or (None, None) if nothing is stored yet.
+    """
+
+    state = load_session_state(session_id)
+
+    if state is None or state.get("current_version") not in RESULT_FILES:
+        return state, None
+
+    result_file = open_session_file(session_id, RESULT_FILES[state["current_version"]])
+
+    if result_file is None:
+        return state, None
+
+    with result_file:
+        return state, read_json_file(result_file)
+
+
+def read_archive_member(archive_path, member_name):
+    """
+    Reads one file out of a compacted session archive.
+    Both formats are streamed, stopping at the member, instead of
+    listing (and so decompressing) the whole archive first.
+    Returns its bytes, or None if the archive does not contain it.
+    """
+
+    with open(archive_path, "rb") as raw:
+        if archive_path.endswith(".zst"):
+            with tarfile.open(fileobj=zstandard.ZstdDecompressor().stream_reader(raw), mode="r|") as tar:
+                return _read_streamed_member(tar, member_name)
+
+        with tarfile.open(fileobj=raw, mode="r|xz") as tar:
+            return _read_streamed_member(tar, member_name)
+
+
+def _read_streamed_member(tar, member_name):
+    for member in tar:
+        if member.name == member_name:
+            return tar.extractfile(member).read()
+
+    return None
+
+
+def open_session_file(session_id, relative_path):
+    """
+    Opens a session file in binary mode, whether it is still on disk
+    or inside the session's compacted archive.
+    Returns None if the file does not exist.
+    """
+
+    session_folder = get_session_folder(session_id)
+    path = os.path.join(session_folder, relative_path)
+
+    if os.path.exists(path):
+        return open(path, "rb")
+
+    for archive_name in (ARCHIVE_ZSTD, ARCHIVE_XZ):
+        archive_path = os.path.join(session_folder, archive_name)
+
+        if os.path.exists(archive_path):
+            data = read_archive_member(archive_path, relative_path.replace(os.sep, "/"))
+            return io.BytesIO(data) if data is not None else None
+
+    return None
@@ -5,17 +5,21 @@ import numpy as np
 import re
 
 
-def generate_summary(text, num_sentences=3):
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def generate_summary(text, num_sentences=3, sentences=None):
     """
     Generate extractive summary using TF-IDF sentence scoring
+    sentences: already-split sentences of text, skips re-splitting
     """
 
     if not isinstance(text, str) or len(text.split()) < 40:
         return ""
 
     # Split into sentences
-    sentence_pattern = re.compile(r'(?<=[.!?])\s+')
-    sentences = sentence_pattern.split(text)
+    if sentences is None:
+        sentences = SENTENCE_PATTERN.split(text)
 
     if len(sentences) <= num_sentences:
         return text.strip()
@@ -36,4 +40,52 @@ def generate_summary(text, num_sentences=3):
 
     except Exception as e:
         print("Summary error:", e)
-        return ""
\ No newline at end of file
+        return ""
+
+
+def summarize_with_embeddings(
+    sentences,
+    embeddings,
+    num_sentences=3,
+    diversity=0.3,
+    text=None
+):
+    """
+    Extractive summary from precomputed sentence embeddings.
+    Ranks sentences by similarity to the topic centroid and picks
+    them with maximal marginal relevance to avoid repetition.
+    sentences: the topic's sentences
+    embeddings: matching L2-normalised rows of the segmentation matrix
+    text: the topic text, if the caller already has it
+    """
+
+    if text is None:
+        text = " ".join(sentences)
+
+    if len(text.split()) < 40:
+        return ""
+
+    if len(sentences) <= num_sentences:
+        return text.strip()
+
+    centroid = embeddings.mean(axis=0)
+    centroid /= np.linalg.norm(centroid) or 1.0
+
+    relevance = embeddings @ centroid
+
+    selected = [int(np.argmax(relevance))]
+
+    # Highest similarity of each sentence to anything already selected
+    redundancy = embeddings @ embeddings[selected[0]]
+
+    while len(selected) < num_sentences:
+        mmr = (1 - diversity) * relevance - diversity * redundancy
+        mmr[selected] = -np.inf
+
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, embeddings @ embeddings[best])
+
+    summary = " ".join(sentences[i] for i in sorted(selected))
+
+    return summary.strip()
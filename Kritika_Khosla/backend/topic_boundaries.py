@@ -0,0 +1,143 @@
+# backend/topic_boundaries.py
+
+import numpy as np
+
+
+def adjacent_similarities(vectors):
+    """
+    Cosine similarity between each row and the next.
+    Rows must already be L2-normalised.
+    """
+
+    if len(vectors) < 2:
+        return np.zeros(0, dtype=np.float32)
+
+    return np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+
+
+def split_on_similarity(similarities, threshold, min_blocks_per_topic=3):
+    """
+    Cuts a sentence sequence wherever the similarity to the next
+    sentence drops below threshold, once the current topic has
+    at least min_blocks_per_topic sentences.
+
+    Returns list of (start, end) sentence index ranges.
+    """
+
+    num_sentences = len(similarities) + 1
+    ranges = []
+    start = 0
+
+    for i, sim in enumerate(similarities):
+        if sim < threshold and (i + 1 - start) >= min_blocks_per_topic:
+            ranges.append((start, i + 1))
+            start = i + 1
+
+    ranges.append((start, num_sentences))
+
+    return ranges
+
+
+def join_ranges(sentences, ranges):
+    """
+    Joins each sentence range into one topic string.
+    """
+
+    return [" ".join(sentences[start:end]) for start, end in ranges]
+
+
+def segmentation_output(sentences, ranges=None, embeddings=None, return_details=False):
+    """
+    Builds the return value shared by all segmenters.
+    ranges=None keeps every sentence as its own block (the fallback
+    when segmentation is not possible).
+
+    With return_details=True, returns a dict with the (start, end)
+    sentence index ranges and the sentence embedding matrix, if the
+    segmenter computed one. Topic strings are not built; callers slice
+    them from the sentence span index when needed.
+    """
+
+    sentences = sentences or []
+
+    if ranges is None:
+        ranges = [(i, i + 1) for i in range(len(sentences))]
+
+    if not return_details:
+        return join_ranges(sentences, ranges)
+
+    return {
+        "ranges": ranges,
+        "embeddings": embeddings
+    }
+
+
+def split_on_similarity_grid(similarities, thresholds, min_blocks_per_topic):
+    """
+    split_on_similarity for many configurations in one pass.
+    thresholds, min_blocks_per_topic: one value per configuration.
+
+    The current topic start of every configuration is kept in one
+    vector and updated together at each gap, visiting only gaps that
+    fall below at least one threshold.
+    Returns one list of (start, end) ranges per configuration.
+    """
+
+    similarities = np.asarray(similarities)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    min_blocks = np.asarray(min_blocks_per_topic, dtype=np.int64)
+
+    num_sentences = len(similarities) + 1
+
+    below = similarities[None, :] < thresholds[:, None]
+    cuts = np.zeros_like(below)
+    start = np.zeros(len(thresholds), dtype=np.int64)
+
+    for i in np.flatnonzero(below.any(axis=0)):
+        cut = below[:, i] & (i + 1 - start >= min_blocks)
+        cuts[:, i] = cut
+        start[cut] = i + 1
+
+    grid = []
+
+    for row in cuts:
+        bounds = np.concatenate(([0], np.flatnonzero(row) + 1, [num_sentences])).tolist()
+        grid.append(list(zip(bounds[:-1], bounds[1:])))
+
+    return grid
+
+
+# Consistency check: a parameter sweep must give the same ranges and
+# topic sentiment as running each configuration on its own.
+# Run from the project root: python -m backend.topic_boundaries
+if __name__ == "__main__":
+    from .sentiment_batch import aggregate_topics
+
+    rng = np.random.default_rng(0)
+
+    similarities = rng.uniform(-0.2, 1.0, 300)
+    scores = rng.uniform(-1.0, 1.0, len(similarities) + 1)
+
+    percentiles = [5, 10, 20, 30]
+    min_blocks = [1, 3, 8]
+    configs = [(p, m) for p in percentiles for m in min_blocks]
+
+    thresholds = np.percentile(similarities, [p for p, _ in configs])
+    grid = split_on_similarity_grid(similarities, thresholds, [m for _, m in configs])
+
+    distinct_ranges = sorted({r for ranges in grid for r in ranges})
+    swept = dict(zip(distinct_ranges, aggregate_topics(scores, distinct_ranges)))
+
+    for (percentile, blocks), threshold, ranges in zip(configs, thresholds, grid):
+        single = split_on_similarity(similarities, threshold, blocks)
+        assert ranges == single, f"ranges differ for percentile={percentile}, min_blocks={blocks}"
+
+        for r, topic in zip(single, aggregate_topics(scores, single)):
+            assert swept[r]["score"] == topic["score"], f"sentiment differs for range {r}"
+            assert swept[r]["label"] == topic["label"], f"label differs for range {r}"
+
+    # Overlapping ranges sharing a start
+    overlap = aggregate_topics(np.array([1, 1, 1, 1, -1, -1, -1, -1], dtype=float), [(0, 4), (0, 8), (4, 8)])
+    assert [t["score"] for t in overlap] == [1.0, 0.0, -1.0], overlap
+
+    print(f"Sweep of {len(configs)} configurations matches single runs")
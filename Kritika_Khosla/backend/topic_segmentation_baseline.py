@@ -1,7 +1,10 @@
 import os
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
+from .topic_boundaries import split_on_similarity, segmentation_output
+
 
 def segment_topics(
     input_folder,
@@ -83,7 +86,88 @@ def segment_topics(
     return generated_files
 
 
-# Optional standalone execution
+def tfidf_adjacent_similarities(sentences, min_df=1):
+    """
+    TF-IDF cosine similarity between each sentence and the next.
+    Rows are L2-normalised by the vectorizer, so one sparse
+    element-wise product of shifted rows gives every similarity.
+    """
+
+    vectorizer = TfidfVectorizer(
+        stop_words="english",
+        min_df=min_df
+    )
+
+    tfidf = vectorizer.fit_transform(sentences)
+
+    return np.asarray(tfidf[:-1].multiply(tfidf[1:]).sum(axis=1)).ravel()
+
+
+def tfidf_threshold(similarities, percentile):
+    """
+    Cut threshold for TF-IDF similarities. Sentence pairs sharing no
+    content word all tie at exactly 0; once they reach the percentile
+    the threshold is 0 and the strict comparison in split_on_similarity
+    never cuts, so the percentile is then taken over the non-zero gaps.
+    """
+
+    threshold = np.percentile(similarities, percentile)
+
+    if threshold <= 0 and np.any(similarities > 0):
+        threshold = np.percentile(similarities[similarities > 0], percentile)
+
+    return threshold
+
+
+def segment_topics_tfidf(
+    sentences,
+    min_blocks_per_topic=3,
+    similarity_drop_percentile=20,
+    min_df=1,
+    return_details=False
+):
+    """
+    In-memory fast-path segmenter using TF-IDF similarity.
+    Same input and output as segment_topics_embeddings
+    (no embedding matrix is computed).
+    """
+
+    if not sentences or len(sentences) < 3:
+        return segmentation_output(sentences, return_details=return_details)
+
+    try:
+        similarities = tfidf_adjacent_similarities(sentences, min_df=min_df)
+
+        threshold = tfidf_threshold(similarities, similarity_drop_percentile)
+
+        ranges = split_on_similarity(similarities, threshold, min_blocks_per_topic)
+
+        return segmentation_output(sentences, ranges, return_details=return_details)
+
+    except Exception as e:
+        print("Topic segmentation error:", e)
+        return segmentation_output(sentences, return_details=return_details)
+
+
+# Optional standalone execution, after a check that conversational
+# text (many sentence pairs without a shared word) is still split
 if __name__ == "__main__":
+    topic_sentences = [
+        ["The market fell today.", "Investors sold shares in the market.", "Yeah.", "Right, okay.",
+         "Shares of banks led the market lower.", "Sure."],
+        ["The recipe needs fresh basil.", "Chop the basil finely.", "Mm.", "Nice.",
+         "Add basil to the tomato sauce.", "Exactly."],
+        ["The team won the final match.", "The match went to penalties.", "Wow.", "Okay.",
+         "Their keeper saved the last match penalty.", "Great."]
+    ]
+    check_sentences = [s for topic in topic_sentences for s in topic]
+
+    check_similarities = tfidf_adjacent_similarities(check_sentences)
+    assert np.percentile(check_similarities, 20) == 0, "check needs many zero gaps"
+
+    check_topics = segment_topics_tfidf(check_sentences, min_blocks_per_topic=3)
+    assert len(check_topics) > 1, "zero-similarity ties left the transcript as one topic"
+    print(f"TF-IDF check: {len(check_topics)} topics from {len(check_sentences)} sentences")
+
     INPUT_DIR = "../dataset/merged_transcripts"
     segment_topics(INPUT_DIR)
\ No newline at end of file
@@ -1,56 +1,78 @@
 # backend/topic_segmentation_embeddings.py
 
+import os
+import threading
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from .topic_boundaries import adjacent_similarities, split_on_similarity, segmentation_output
+
+# "torch" (SentenceTransformer) or "onnx" (int8 onnxruntime export)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+
+# Loaded once per (backend, model name) and shared across requests
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name="all-MiniLM-L6-v2", backend=None):
+    """
+    Returns a cached embedding model with a SentenceTransformer-style encode().
+    """
+
+    backend = backend or EMBEDDING_BACKEND
+
+    with _models_lock:
+        if (backend, model_name) not in _models:
+            if backend == "onnx":
+                from .embedding_onnx import OnnxSentenceEncoder
+                _models[(backend, model_name)] = OnnxSentenceEncoder(model_name)
+            elif backend == "torch":
+                _models[(backend, model_name)] = SentenceTransformer(model_name)
+            else:
+                raise ValueError(f"Unknown embedding backend: {backend}")
+
+    return _models[(backend, model_name)]
+
+
+def encode_sentences(sentences, model_name="all-MiniLM-L6-v2", backend=None):
+    """
+    Encodes sentences into L2-normalised embeddings.
+    """
+
+    model = get_embedding_model(model_name, backend)
+
+    return model.encode(sentences, normalize_embeddings=True)
 
 
 def segment_topics_embeddings(
     sentences,
     model_name="all-MiniLM-L6-v2",
     min_blocks_per_topic=3,
-    similarity_drop_percentile=20
+    similarity_drop_percentile=20,
+    return_details=False
 ):
     """
     Segments text into topic blocks using embeddings.
     sentences: list of sentence strings
+    return_details=True also returns index ranges and embeddings.
     """
 
     if not sentences or len(sentences) < 3:
-        return sentences
+        return segmentation_output(sentences, return_details=return_details)
 
-    try:
-        model = SentenceTransformer(model_name)
-        embeddings = model.encode(sentences)
+    embeddings = None
 
-        similarities = []
-        for i in range(len(embeddings) - 1):
-            sim = cosine_similarity(
-                embeddings[i].reshape(1, -1),
-                embeddings[i + 1].reshape(1, -1)
-            )[0][0]
-            similarities.append(sim)
-
-        if not similarities:
-            return sentences
+    try:
+        embeddings = encode_sentences(sentences, model_name)
+        similarities = adjacent_similarities(embeddings)
 
         threshold = np.percentile(similarities, similarity_drop_percentile)
 
-        segments = []
-        current_segment = [sentences[0]]
-
-        for i, sim in enumerate(similarities):
-            if sim < threshold and len(current_segment) >= min_blocks_per_topic:
-                segments.append(" ".join(current_segment))
-                current_segment = []
-
-            current_segment.append(sentences[i + 1])
-
-        if current_segment:
-            segments.append(" ".join(current_segment))
+        ranges = split_on_similarity(similarities, threshold, min_blocks_per_topic)
 
-        return segments
+        return segmentation_output(sentences, ranges, embeddings, return_details)
 
     except Exception as e:
         print("Topic segmentation error:", e)
-        return sentences
\ No newline at end of file
+        return segmentation_output(sentences, None, embeddings, return_details)
@@ -0,0 +1,67 @@
+# backend/topic_segmentation_hybrid.py
+
+import numpy as np
+
+from .topic_boundaries import split_on_similarity, segmentation_output
+from .topic_segmentation_baseline import tfidf_adjacent_similarities
+from .topic_segmentation_embeddings import encode_sentences
+
+
+def segment_topics_hybrid(
+    sentences,
+    model_name="all-MiniLM-L6-v2",
+    min_blocks_per_topic=3,
+    similarity_drop_percentile=20,
+    candidate_percentile=30,
+    return_details=False
+):
+    """
+    TF-IDF picks candidate boundaries, embeddings confirm them.
+    Only sentences on either side of a candidate are encoded,
+    so no full embedding matrix is returned.
+    """
+
+    if not sentences or len(sentences) < 3:
+        return segmentation_output(sentences, return_details=return_details)
+
+    try:
+        tfidf_similarities = tfidf_adjacent_similarities(sentences)
+
+        # The candidate_percentile% lowest-similarity gaps are the candidate
+        # boundaries. Taken by rank, not by threshold: many gaps tie at 0
+        # and a threshold would select all of them.
+        num_candidates = min(
+            len(tfidf_similarities),
+            max(1, int(np.ceil(candidate_percentile / 100.0 * len(tfidf_similarities))))
+        )
+        candidates = np.sort(
+            np.argpartition(tfidf_similarities, num_candidates - 1)[:num_candidates]
+        )
+
+        # Sentences touching a candidate gap, each encoded once
+        needed = np.union1d(candidates, candidates + 1)
+        embeddings = encode_sentences([sentences[i] for i in needed], model_name)
+
+        position = np.searchsorted(needed, candidates)
+        position_next = np.searchsorted(needed, candidates + 1)
+        candidate_similarities = np.einsum(
+            "ij,ij->i",
+            embeddings[position],
+            embeddings[position_next]
+        )
+
+        # Non-candidate gaps can never become boundaries
+        similarities = np.full(len(tfidf_similarities), np.inf)
+        similarities[candidates] = candidate_similarities
+
+        # Keep the overall boundary rate of the embedding segmenter
+        percentile = min(100.0, similarity_drop_percentile * 100.0 / candidate_percentile)
+        threshold = np.percentile(candidate_similarities, percentile)
+
+        ranges = split_on_similarity(similarities, threshold, min_blocks_per_topic)
+
+        return segmentation_output(sentences, ranges, return_details=return_details)
+
+    except Exception as e:
+        print("Topic segmentation error:", e)
+        return segmentation_output(sentences, return_details=return_details)
@@ -1,34 +1,438 @@
 # backend/transcribe_all.py
 
 import os
+import json
+import time
+import uuid
+import wave
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import whisper
 
-print("Loading Whisper model (this happens only once)...")
-model = whisper.load_model("base")
+from .audio_chunk import load_chunk_manifest, export_wav_span
+from .transcript_store import TranscriptStore
+from .transcript_stitch import stitch_chunk_results
+from .audio_fingerprint import fingerprint_file, find_cached_region
+from .decoding_session import DecodingSession, DEFAULT_TEMPERATURES
+from .asr_stub import StubWhisperModel
 
+# ASR_STUB=1 swaps Whisper for a fast stand-in (see asr_stub), for load tests
+ASR_STUB = os.getenv("ASR_STUB", "0") == "1"
 
-def transcribe_audio_folder(chunks_folder, base_folder):
+
+def _load_model(model_name):
+    if ASR_STUB:
+        return StubWhisperModel(model_name)
+
+    return whisper.load_model(model_name)
+
+
+# Models are loaded on first use, once per process and size, and not at
+# import: spawned pool workers import this module too and must only load
+# the size they decode with (the server preloads "base" at startup)
+_loaded_models = {}
+_model_locks = {}
+_load_lock = threading.Lock()
+
+
+def _env_temperatures(name, default):
+    """
+    Temperature schedule from a comma-separated variable, e.g. "0,0.4,0.8";
+    a single value ("0") disables fallback.
+    """
+
+    value = os.getenv(name, "").strip()
+
+    if not value:
+        return default
+
+    return tuple(float(t) for t in value.split(","))
+
+
+# Fallback schedule of the full pass (DECODE_TEMPERATURES, default Whisper's)
+DECODE_TEMPERATURES = _env_temperatures("DECODE_TEMPERATURES", DEFAULT_TEMPERATURES)
+
+# CARRY_PROMPT=0 decodes every chunk without the previous chunk's text
+CARRY_PROMPT = os.getenv("CARRY_PROMPT", "1") == "1"
+
+# Episode-level decode policy for the full pass: language detected
+# once, previous chunk text carried as prompt, fallback schedule
+FINAL_DECODE_OPTIONS = {
+    "temperature": DECODE_TEMPERATURES,
+    "carry_prompt": CARRY_PROMPT
+}
+
+# Greedy decode with no temperature fallback and no prompt, used for fast drafts
+DRAFT_DECODE_OPTIONS = {
+    "temperature": 0.0,
+    "carry_prompt": False,
+    "condition_on_previous_text": False
+}
+
+TRANSCRIPT_STORE_FILE = "transcript.npz"
+
+
+def get_whisper_model(model_name="base"):
+    """
+    Returns (model, lock) for a Whisper model size.
+    The lock serialises decodes, since Whisper installs
+    per-call hooks on the shared model.
+    """
+
+    with _load_lock:
+        if model_name not in _loaded_models:
+            print(f"Loading Whisper model '{model_name}'...")
+            _loaded_models[model_name] = _load_model(model_name)
+            _model_locks[model_name] = threading.Lock()
+
+    return _loaded_models[model_name], _model_locks[model_name]
+
+
+def _init_worker(model_name):
+    # Each worker process decodes with its own copy of the model
+    get_whisper_model(model_name)
+
+
+def _transcribe_in_worker(file_path, model_name, decode_options):
+    asr_model, _ = get_whisper_model(model_name)
+    return asr_model.transcribe(file_path, **decode_options)
+
+
+# Worker pools by (model_name, workers), kept for the life of the process
+# so each worker loads its model once rather than once per episode
+_worker_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_pool(model_name, workers):
+    with _pools_lock:
+        key = (model_name, workers)
+
+        if key not in _worker_pools:
+            # Spawned, not forked: the server process has live threads and
+            # an initialised torch/OpenMP runtime that forked children can hang on
+            _worker_pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name,)
+            )
+
+        return _worker_pools[key]
+
+
+def _discard_worker_pool(model_name, workers):
+    # A crashed worker breaks the whole pool; the next call starts a new one
+    with _pools_lock:
+        pool = _worker_pools.pop((model_name, workers), None)
+
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _has_overlap(manifest):
+    return any(
+        following["start_ms"] < previous["end_ms"]
+        for previous, following in zip(manifest, manifest[1:])
+    )
+
+
+# Cached segments may stick out of the matched region by this much (seconds)
+REGION_TOLERANCE = 0.5
+
+# Unmatched chunk edges shorter than this (seconds) are not decoded
+MIN_NOVEL_SECONDS = 1.0
+
+
+def _shift_segment(segment, delta):
+    """
+    Copy of a Whisper segment (and its words) moved by delta seconds.
+    """
+
+    shifted = dict(segment, start=segment["start"] + delta, end=segment["end"] + delta)
+
+    if segment.get("words"):
+        shifted["words"] = [
+            dict(word, start=word["start"] + delta, end=word["end"] + delta)
+            for word in segment["words"]
+        ]
+
+    return shifted
+
+
+def _join_text(segments):
+    return "".join(segment["text"] for segment in segments).strip()
+
+
+def _wav_seconds(path):
+    with wave.open(path, "rb") as w:
+        return w.getnframes() / w.getframerate()
+
+
+def _reused_segments(region, duration):
+    """
+    Cached segments that fall inside the shared region, in this
+    chunk's time. Segments crossing the region edge are left out;
+    their audio is decoded again as part of a novel span.
+    """
+
+    with open(region["result_path"], "r", encoding="utf-8") as f:
+        cached = json.load(f)
+
+    low = max(region["start"] - REGION_TOLERANCE, -REGION_TOLERANCE)
+    high = min(region["end"], duration) + REGION_TOLERANCE
+
+    segments = []
+
+    for segment in cached.get("segments", []):
+        segment = _shift_segment(segment, -region["offset"])
+
+        if segment["start"] >= low and segment["end"] <= high:
+            segment["start"] = max(segment["start"], 0.0)
+            segment["end"] = min(segment["end"], duration)
+            segments.append(segment)
+
+    return segments
+
+
+def _novel_spans(segments, duration):
+    """
+    Parts of a chunk not covered by reused segments: before the
+    first and after the last one.
+    """
+
+    spans = []
+
+    if segments[0]["start"] >= MIN_NOVEL_SECONDS:
+        spans.append((0.0, segments[0]["start"]))
+
+    if duration - segments[-1]["end"] >= MIN_NOVEL_SECONDS:
+        spans.append((segments[-1]["end"], duration))
+
+    return spans
+
+
+def transcribe_audio_folder(
+    chunks_folder,
+    base_folder,
+    model_name="base",
+    decode_options=None,
+    workers=1,
+    fingerprint_index=None,
+    session_id=None,
+    report=None,
+    asr_service=None
+):
     """
     Transcribes all audio chunks inside folder.
-    Saves transcripts inside session folder.
+    Saves transcripts inside session folder: one .txt per chunk
+    and a timestamped TranscriptStore (transcript.npz).
+
+    Overlapping chunks are decoded with word timestamps and stitched
+    so the shared audio appears only once. workers > 1 decodes chunks
+    in a long-lived pool of that many processes (see get_worker_pool).
+
+    With a fingerprint_index, audio that was already decoded is not
+    decoded again: a chunk sharing a region with a cached chunk
+    (repeated intro, sponsor read, re-upload) reuses the cached
+    segments of that region, and only the novel spans around it go
+    to the model.
+    report: optional dict, filled with reuse statistics
+    asr_service: optional AsrBatchingService; chunks are then decoded
+    in micro-batches shared with other sessions
+
+    decode_options are Whisper transcribe() options plus the episode
+    policy keys "language", "temperature" (fallback schedule) and
+    "carry_prompt" (see DecodingSession). The prompt is only carried
+    when chunks are decoded sequentially.
     """
 
     transcripts_folder = os.path.join(base_folder, "transcripts")
     os.makedirs(transcripts_folder, exist_ok=True)
 
-    audio_files = sorted([
-        f for f in os.listdir(chunks_folder)
-        if f.endswith(".wav")
-    ])
+    # Novel parts of partially reused chunks, cut out for decoding
+    spans_folder = os.path.join(base_folder, "spans")
+    os.makedirs(spans_folder, exist_ok=True)
+
+    decode_options = dict(FINAL_DECODE_OPTIONS if decode_options is None else decode_options)
+
+    temperature = decode_options.pop("temperature", DEFAULT_TEMPERATURES)
+    if isinstance(temperature, (int, float)):
+        temperature = (temperature,)
+
+    asr_model, lock = get_whisper_model(model_name)
+
+    # Stub transcripts must never be reused for real decodes
+    cache_model_name = "stub:" + model_name if ASR_STUB else model_name
+
+    decoding = DecodingSession(
+        asr_model,
+        lock,
+        language=decode_options.pop("language", None),
+        decode_options=decode_options,
+        temperatures=temperature,
+        carry_prompt=decode_options.pop("carry_prompt", True)
+    )
+
+    manifest = load_chunk_manifest(chunks_folder)
+    audio_files = [entry["file"] for entry in manifest]
+    file_paths = [os.path.join(chunks_folder, file) for file in audio_files]
+
+    overlapping = _has_overlap(manifest)
+    if overlapping:
+        decode_options.setdefault("word_timestamps", True)
 
     print(f"Found {len(audio_files)} audio files")
 
-    for i, file in enumerate(audio_files, start=1):
-        file_path = os.path.join(chunks_folder, file)
+    durations = [(entry["end_ms"] - entry["start_ms"]) / 1000 for entry in manifest]
+    fingerprints = [None] * len(file_paths)
+
+    # Segments reused from cached chunks, per chunk (chunk-relative times)
+    reused = [[] for _ in file_paths]
+
+    # What still goes to the model: (chunk index, offset in chunk, audio path)
+    tasks = []
+
+    for i, file_path in enumerate(file_paths):
+        if fingerprint_index is not None:
+            try:
+                (hashes, frames), _ = fingerprint_file(file_path)
+                fingerprints[i] = (hashes, frames)
+                region = find_cached_region(fingerprint_index, hashes, frames, cache_model_name)
+            except Exception as e:
+                print("Fingerprint error:", e)
+                region = None
 
-        print(f"[{i}/{len(audio_files)}] Transcribing {file}")
+            if region is not None:
+                reused[i] = _reused_segments(region, durations[i])
 
-        result = model.transcribe(file_path)
+        if not reused[i]:
+            tasks.append((i, 0.0, file_path))
+            continue
+
+        spans = _novel_spans(reused[i], durations[i])
+        print(f"Reusing cached transcript for {audio_files[i]} ({len(spans)} novel spans)")
+
+        for k, (start, end) in enumerate(spans):
+            span_path = os.path.join(
+                spans_folder,
+                f"{os.path.splitext(audio_files[i])[0]}_span{k}.wav"
+            )
+            export_wav_span(file_path, span_path, start, end)
+            tasks.append((i, start, span_path))
+
+    task_paths = [path for _, _, path in tasks]
+
+    if tasks:
+        decoding.detect_language(task_paths)
+        print(f"Episode language: {decoding.language}")
+
+    # Options for paths that decode chunks independently
+    parallel_options = dict(decoding.decode_options, temperature=decoding.temperatures)
+    if decoding.language:
+        parallel_options["language"] = decoding.language
+
+    if asr_service is not None and tasks:
+        print(f"Submitting {len(tasks)} chunks to the ASR service ({asr_service.model_name})")
+
+        start = time.perf_counter()
+        decoded = asr_service.transcribe_many(session_id, task_paths, parallel_options)
+        decoding.record_external(len(tasks), time.perf_counter() - start)
+    elif workers > 1 and len(tasks) > 1:
+        print(f"Transcribing {len(tasks)} chunks with {workers} workers ({model_name})")
+
+        pool = get_worker_pool(model_name, workers)
+        start = time.perf_counter()
+
+        try:
+            decoded = list(pool.map(
+                _transcribe_in_worker,
+                task_paths,
+                [model_name] * len(tasks),
+                [parallel_options] * len(tasks)
+            ))
+        except BrokenProcessPool:
+            _discard_worker_pool(model_name, workers)
+            raise
+
+        decoding.record_external(len(tasks), time.perf_counter() - start)
+    else:
+        decoded = []
+        previous_chunk = -1
+
+        for i, offset, path in tasks:
+            # Fully reused chunks in between still provide the prompt
+            for k in range(previous_chunk + 1, i):
+                decoding.previous_text = _join_text(reused[k]) or decoding.previous_text
+
+            # Reused speech just before this span is the better prompt
+            before = [seg for seg in reused[i] if seg["end"] <= offset + REGION_TOLERANCE]
+            if before:
+                decoding.previous_text = _join_text(before)
+
+            print(f"[{i + 1}/{len(file_paths)}] Transcribing {os.path.basename(path)} ({model_name})")
+
+            decoded.append(decoding.transcribe(path))
+            previous_chunk = i
+
+    # Reassemble each chunk from its reused and freshly decoded parts
+    parts = [[seg for seg in segments] for segments in reused]
+    for (i, offset, _), result in zip(tasks, decoded):
+        parts[i].extend(_shift_segment(seg, offset) for seg in result["segments"])
+
+    results = []
+    for segments in parts:
+        segments.sort(key=lambda seg: seg["start"])
+        results.append({"text": _join_text(segments), "segments": segments})
+
+    decoded_chunks = sorted({i for i, _, _ in tasks})
+
+    if fingerprint_index is not None:
+        for i in decoded_chunks:
+            if fingerprints[i] is None:
+                continue
+
+            # Complete per-chunk result, cached for later reuse
+            result_path = fingerprint_index.result_path(
+                session_id or uuid.uuid4().hex,
+                os.path.splitext(audio_files[i])[0]
+            )
+            with open(result_path, "w", encoding="utf-8") as f:
+                json.dump(results[i], f, ensure_ascii=False)
+
+            fingerprint_index.add(
+                *fingerprints[i],
+                kind="chunk",
+                session_id=session_id,
+                model_name=cache_model_name,
+                duration=durations[i],
+                result_path=result_path
+            )
+
+        fingerprint_index.save()
+
+    if report is not None:
+        decoded_seconds = sum(
+            (durations[i] - offset) if path == file_paths[i] else _wav_seconds(path)
+            for i, offset, path in tasks
+        )
+        report["chunks"] = len(file_paths)
+        report["reused_chunks"] = len(file_paths) - len(decoded_chunks)
+        report["partially_reused_chunks"] = sum(
+            1 for i in decoded_chunks if reused[i]
+        )
+        report["skipped_fraction"] = (
+            round(max(sum(durations) - decoded_seconds, 0.0) / sum(durations), 3)
+            if sum(durations) else 0.0
+        )
+        report["decoding"] = decoding.timings()
+
+    if overlapping:
+        results = stitch_chunk_results(results, manifest)
+
+    for file, result in zip(audio_files, results):
         text = result["text"].strip()
 
         output_file = os.path.join(
@@ -39,6 +443,12 @@ def transcribe_audio_folder(chunks_folder, base_folder):
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(text)
 
+    store = TranscriptStore.from_whisper_results(
+        results,
+        [entry["start_ms"] / 1000 for entry in manifest]
+    )
+    store.save(os.path.join(transcripts_folder, TRANSCRIPT_STORE_FILE))
+
     print("All files processed.")
 
-    return transcripts_folder
\ No newline at end of file
+    return transcripts_folder
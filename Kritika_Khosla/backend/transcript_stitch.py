@@ -0,0 +1,152 @@
+# backend/transcript_stitch.py
+
+import re
+from difflib import SequenceMatcher
+
+NON_WORD = re.compile(r"[^\w']+")
+
+# Matched words whose absolute times differ by more than this (seconds)
+# are coincidences, not the same spoken word
+MAX_TIME_DRIFT = 1.0
+
+
+def _normalise(word):
+    return NON_WORD.sub("", word.lower())
+
+
+def _chunk_words(result, offset):
+    """
+    Flattens a Whisper result into words with absolute times.
+    Uses word timestamps when present, otherwise treats each
+    segment as one unit.
+    """
+
+    words = []
+
+    for segment_index, segment in enumerate(result.get("segments", [])):
+        units = segment.get("words") or [{
+            "word": segment["text"],
+            "start": segment["start"],
+            "end": segment["end"]
+        }]
+
+        for unit in units:
+            words.append({
+                "word": unit["word"],
+                "start": offset + unit["start"],
+                "end": offset + unit["end"],
+                "segment": segment_index
+            })
+
+    return words
+
+
+def _find_seam(previous, following, overlap_start, overlap_end):
+    """
+    Picks where to switch from the previous chunk's words to the next.
+    Returns (cut in previous, cut in following): previous keeps
+    words[:cut], following keeps words[cut:].
+
+    The overlapping words of both chunks are aligned by token; among
+    matches that agree in time, the one nearest the middle of the
+    overlap is the seam. Without a match, both sides are cut at the
+    overlap midpoint.
+    """
+
+    midpoint = (overlap_start + overlap_end) / 2
+
+    prev_idx = [i for i, w in enumerate(previous) if w["end"] > overlap_start]
+    next_idx = [i for i, w in enumerate(following) if w["start"] < overlap_end]
+
+    prev_tokens = [_normalise(previous[i]["word"]) for i in prev_idx]
+    next_tokens = [_normalise(following[i]["word"]) for i in next_idx]
+
+    best = None
+
+    matcher = SequenceMatcher(None, prev_tokens, next_tokens, autojunk=False)
+
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            a = prev_idx[block.a + k]
+            b = next_idx[block.b + k]
+
+            if not prev_tokens[block.a + k]:
+                continue
+
+            if abs(previous[a]["start"] - following[b]["start"]) > MAX_TIME_DRIFT:
+                continue
+
+            distance = abs(following[b]["start"] - midpoint)
+
+            if best is None or distance < best[0]:
+                best = (distance, a, b)
+
+    if best is not None:
+        # The matched word is taken from the following chunk
+        return best[1], best[2]
+
+    prev_cut = sum(1 for w in previous if w["start"] < midpoint)
+    next_cut = sum(1 for w in following if w["start"] < midpoint)
+
+    return prev_cut, next_cut
+
+
+def _rebuild_result(words, offset):
+    """
+    Groups kept words back into Whisper-style segments (chunk-relative times).
+    """
+
+    segments = []
+
+    for word in words:
+        if segments and segments[-1]["_index"] == word["segment"]:
+            segment = segments[-1]
+            segment["text"] += word["word"]
+            segment["end"] = word["end"] - offset
+        else:
+            segments.append({
+                "_index": word["segment"],
+                "text": word["word"],
+                "start": word["start"] - offset,
+                "end": word["end"] - offset
+            })
+
+    for segment in segments:
+        del segment["_index"]
+
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments
+    }
+
+
+def stitch_chunk_results(results, manifest):
+    """
+    Removes the duplicated speech of overlapping chunks.
+    results: Whisper results in chunk order
+    manifest: matching chunk entries with start_ms / end_ms
+    Returns new results whose segments no longer overlap.
+    """
+
+    offsets = [entry["start_ms"] / 1000 for entry in manifest]
+    words = [_chunk_words(result, offset) for result, offset in zip(results, offsets)]
+
+    keep_from = [0] * len(words)
+    keep_to = [len(w) for w in words]
+
+    for k in range(len(words) - 1):
+        overlap_start = manifest[k + 1]["start_ms"] / 1000
+        overlap_end = manifest[k]["end_ms"] / 1000
+
+        if overlap_end <= overlap_start:
+            continue
+
+        prev_cut, next_cut = _find_seam(words[k], words[k + 1], overlap_start, overlap_end)
+
+        keep_to[k] = max(keep_from[k], prev_cut)
+        keep_from[k + 1] = next_cut
+
+    return [
+        _rebuild_result(w[keep_from[k]:keep_to[k]], offsets[k])
+        for k, w in enumerate(words)
+    ]
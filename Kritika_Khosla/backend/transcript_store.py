@@ -0,0 +1,167 @@
+# backend/transcript_store.py
+
+import re
+import numpy as np
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class TranscriptStore:
+    """
+    Columnar, timestamped transcript of one session.
+
+    Whisper segments are kept as parallel NumPy arrays:
+      start, end     absolute times in seconds
+      chunk          index of the chunk the segment came from
+      text_start     character offset of the segment in `text`
+    plus chunk_offsets (seconds) and one text buffer holding every
+    segment, separated by single spaces.
+
+    Sentence spans are attached once per session and shared by all
+    text stages: a sentence is an offset pair into `text`, a topic is
+    a sentence index range, and time <-> sentence lookups are binary
+    searches over sorted arrays.
+    """
+
+    def __init__(self, start, end, chunk, text_start, chunk_offsets, text,
+                 sentence_start=None, sentence_end=None):
+        self.start = np.asarray(start, dtype=np.float32)
+        self.end = np.asarray(end, dtype=np.float32)
+        self.chunk = np.asarray(chunk, dtype=np.int32)
+        self.text_start = np.asarray(text_start, dtype=np.int64)
+        self.chunk_offsets = np.asarray(chunk_offsets, dtype=np.float32)
+        self.text = text
+
+        # Sentence character spans within `text`
+        self.sentence_start = None
+        self.sentence_end = None
+        self.sentence_start_time = None
+        self.sentence_end_time = None
+
+        if sentence_start is not None:
+            self.attach_sentences(sentence_start, sentence_end)
+
+    def __len__(self):
+        return len(self.start)
+
+    @classmethod
+    def from_whisper_results(cls, results, chunk_offsets):
+        """
+        Builds the store from per-chunk Whisper results.
+        results: list of model.transcribe() outputs, in chunk order
+        chunk_offsets: start of each chunk in the original audio (seconds)
+        """
+
+        starts, ends, chunks, text_starts, pieces = [], [], [], [], []
+        position = 0
+
+        for chunk_index, (result, offset) in enumerate(zip(results, chunk_offsets)):
+            for segment in result.get("segments", []):
+                segment_text = WHITESPACE.sub(" ", segment["text"]).strip()
+
+                if not segment_text:
+                    continue
+
+                starts.append(offset + segment["start"])
+                ends.append(offset + segment["end"])
+                chunks.append(chunk_index)
+                text_starts.append(position)
+                pieces.append(segment_text)
+
+                position += len(segment_text) + 1
+
+        return cls(starts, ends, chunks, text_starts, chunk_offsets, " ".join(pieces))
+
+    def save(self, path):
+        arrays = {
+            "start": self.start,
+            "end": self.end,
+            "chunk": self.chunk,
+            "text_start": self.text_start,
+            "chunk_offsets": self.chunk_offsets,
+            "text": np.frombuffer(self.text.encode("utf-8"), dtype=np.uint8)
+        }
+
+        if self.sentence_start is not None:
+            arrays["sentence_start"] = self.sentence_start
+            arrays["sentence_end"] = self.sentence_end
+
+        np.savez_compressed(path, **arrays)
+
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["start"],
+                data["end"],
+                data["chunk"],
+                data["text_start"],
+                data["chunk_offsets"],
+                data["text"].tobytes().decode("utf-8"),
+                data["sentence_start"] if "sentence_start" in data else None,
+                data["sentence_end"] if "sentence_end" in data else None
+            )
+
+    def segment_at_char(self, positions):
+        """
+        Segment index containing each character position.
+        """
+
+        index = np.searchsorted(self.text_start, positions, side="right") - 1
+        return np.clip(index, 0, max(len(self) - 1, 0))
+
+    def attach_sentences(self, sentence_start, sentence_end):
+        """
+        Stores sentence character spans and derives their audio times.
+        """
+
+        self.sentence_start = np.asarray(sentence_start, dtype=np.int64)
+        self.sentence_end = np.asarray(sentence_end, dtype=np.int64)
+
+        if not len(self):
+            self.sentence_start_time = np.zeros(len(self.sentence_start), dtype=np.float32)
+            self.sentence_end_time = self.sentence_start_time.copy()
+            return
+
+        last_char = np.maximum(self.sentence_end - 1, self.sentence_start)
+
+        self.sentence_start_time = self.start[self.segment_at_char(self.sentence_start)]
+        self.sentence_end_time = self.end[self.segment_at_char(last_char)]
+
+    def sentence_at(self, seconds):
+        """
+        Index of the sentence playing at the given time(s), for seeking.
+        """
+
+        index = np.searchsorted(self.sentence_start_time, seconds, side="right") - 1
+        return np.clip(index, 0, max(len(self.sentence_start_time) - 1, 0))
+
+    def range_times(self, start, end):
+        """
+        Audio (start, end) in seconds of sentence range [start, end).
+        """
+
+        return (
+            float(self.sentence_start_time[start]),
+            float(self.sentence_end_time[end - 1])
+        )
+
+    def sentences(self):
+        """
+        All sentences as a list of strings, for model inputs.
+        """
+
+        text = self.text
+        return [text[s:e] for s, e in zip(self.sentence_start.tolist(), self.sentence_end.tolist())]
+
+    def range_text(self, start, end):
+        """
+        Text of sentence range [start, end) as one slice of the buffer.
+        """
+
+        if start >= end:
+            return ""
+
+        return self.text[self.sentence_start[start]:self.sentence_end[end - 1]]
@@ -21,7 +21,11 @@ embed_model = SentenceTransformer("all-MiniLM-L6-v2")
 
 TRANSCRIPTS_DIR = "data/transcripts"
 SEGMENTS_DIR = "data/segments"
-METADATA_PATH = "data/segment_metadata.json"
+# One JSON object per line, written as segments are produced;
+# mirrored to Parquet when pyarrow is installed
+METADATA_PATH = "data/segment_metadata.jsonl"
+METADATA_PARQUET_PATH = "data/segment_metadata.parquet"
+PARQUET_BATCH_SIZE = 10000
 
 os.makedirs(SEGMENTS_DIR, exist_ok=True)
 
@@ -69,8 +73,48 @@ def generate_semantic_topic(summary):
 
     return " ".join(nouns[:3]).title()
 
+def dump_record(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+def iter_metadata(path=METADATA_PATH):
+    """Reads segment metadata lazily, one segment at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def export_parquet(jsonl_path=METADATA_PATH, parquet_path=METADATA_PARQUET_PATH):
+    """Streams the JSONL metadata into Parquet, one row group per batch."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed, skipping Parquet export")
+        return
+
+    writer, batch = None, []
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pylist(batch, schema=writer.schema if writer else None)
+        if writer is None:
+            writer = pq.ParquetWriter(parquet_path, table.schema, compression="zstd")
+        writer.write_table(table)
+        batch.clear()
+
+    for record in iter_metadata(jsonl_path):
+        batch.append(record)
+        if len(batch) >= PARQUET_BATCH_SIZE:
+            flush()
+
+    if batch:
+        flush()
+    if writer is not None:
+        writer.close()
+
 # MAIN 
-metadata = []
+metadata_file = open(METADATA_PATH, "w", encoding="utf-8")
+segment_count = 0
 global_segment_id = 0
 
 episode_files = sorted(
@@ -88,24 +132,43 @@ for episode_file in episode_files:
     with open(os.path.join(TRANSCRIPTS_DIR, episode_file), encoding="utf-8") as f:
         lines = f.readlines()
 
-    texts, start_times = [], []
+    texts, start_times, end_times = [], [], []
 
     for line in lines:
-        start, _ = extract_time(line)
+        start, end = extract_time(line)
         text = clean_line(line)
         if text and start is not None:
             texts.append(text)
             start_times.append(start)
+            end_times.append(end)
 
     if len(texts) < 10:
         continue
 
-    episode_start = start_times[0]
-    episode_end = start_times[-1]
+    start_times = np.array(start_times)
+    end_times = np.array(end_times)
 
     full_text = " ".join(texts)
     sentences = nltk.sent_tokenize(full_text)
 
+    # Character offset of each transcript line inside full_text
+    line_offsets = np.cumsum([0] + [len(t) + 1 for t in texts[:-1]])
+
+    # Character span of each sentence, found in order
+    sentence_starts = np.empty(len(sentences), dtype=np.int64)
+    sentence_ends = np.empty(len(sentences), dtype=np.int64)
+    cursor = 0
+    for i, sentence in enumerate(sentences):
+        found = full_text.find(sentence, cursor)
+        sentence_starts[i] = found if found >= 0 else cursor
+        sentence_ends[i] = cursor = sentence_starts[i] + max(len(sentence), 1)
+
+    # Real line timestamps for each sentence
+    sentence_start_times = start_times[np.searchsorted(line_offsets, sentence_starts, side="right") - 1]
+    sentence_end_times = end_times[
+        np.clip(np.searchsorted(line_offsets, sentence_ends - 1, side="right") - 1, 0, len(texts) - 1)
+    ]
+
     embeddings = embed_model.encode(sentences)
     similarities = [
         cosine_similarity([embeddings[i]], [embeddings[i + 1]])[0][0]
@@ -127,12 +190,8 @@ for episode_file in episode_files:
             continue
 
         # TIMESTAMPS 
-        seg_start = episode_start + (
-            (start_idx / total_sentences) * (episode_end - episode_start)
-        )
-        seg_end = episode_start + (
-            (boundary / total_sentences) * (episode_end - episode_start)
-        )
+        seg_start = float(sentence_start_times[start_idx])
+        seg_end = float(sentence_end_times[boundary - 1])
 
         raw_summary = extractive_summary(seg_sentences)
         summary = remove_speaker_prefix(raw_summary)
@@ -153,7 +212,7 @@ for episode_file in episode_files:
         with open(os.path.join(SEGMENTS_DIR, seg_filename), "w", encoding="utf-8") as f:
             f.write(segment_text)
 
-        metadata.append({
+        metadata_file.write(dump_record({
             "episode_id": episode_id,
             "episode_title": f"Episode {episode_id}",
             "segment_id": global_segment_id,
@@ -169,17 +228,18 @@ for episode_file in episode_files:
                 "start": round(seg_start, 2),
                 "end": round(seg_end, 2)
             }
-        })
+        }) + "\n")
+        segment_count += 1
 
         global_segment_id += 1
         local_segment_id += 1
         start_idx = boundary
 
 # SAVE 
-with open(METADATA_PATH, "w", encoding="utf-8") as f:
-    json.dump(metadata, f, indent=2)
+metadata_file.close()
+export_parquet()
 
 print("\n Tasks completed successfully")
 print(f"• Episodes processed: {len(episode_files)}")
-print(f"• Segments created: {len(metadata)}")
+print(f"• Segments created: {segment_count}")
 